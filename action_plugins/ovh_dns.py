@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns, an Ansible module for managing OVH DNS records
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Run ovh_dns inside the controller process.
+
+ovh_dns only talks to the OVH API, so packaging it with AnsiballZ and
+starting a new interpreter for each task is pure overhead. When the task
+runs on the controller (local or ovh_api connection), this action plugin
+imports the module source once and calls its run_module() directly. Other
+connections still execute the module the usual way.
+
+The ovh_dns_info action plugin reuses this class for ovh_dns_info.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import contextlib
+import importlib.util
+import json
+import os
+import traceback
+
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+from ansible.plugins.action import ActionBase
+
+# Module sources by path, imported once per process
+_MODULES = {}
+
+
+def find_module_source(loader, name):
+    """Return the path of a module source, or None. Plugin directories are
+    skipped: a library path pointing at a checkout of this repository also
+    covers action_plugins/, which holds an action plugin of the same name"""
+    for directory in loader._get_paths():
+        if os.path.basename(directory.rstrip(os.sep)).endswith('_plugins'):
+            continue
+        path = os.path.join(directory, name + '.py')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def use_module_utils(loader):
+    """Make the configured module_utils directories importable as
+    ansible.module_utils, like AnsiballZ does when it packages a module"""
+    import ansible.module_utils
+    for directory in loader._get_paths(subdirs=False):
+        if os.path.isdir(directory) and directory not in ansible.module_utils.__path__:
+            ansible.module_utils.__path__.append(directory)
+
+
+@contextlib.contextmanager
+def environment(variables):
+    """Set environment variables while the module runs, as the environment
+    keyword does for a module executed on a host"""
+    saved = dict((name, os.environ.get(name)) for name in variables)
+    os.environ.update((name, str(value)) for name, value in variables.items())
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def load_module(name, path):
+    """Import a module source without running it"""
+    if path not in _MODULES:
+        spec = importlib.util.spec_from_file_location('ansible_{}_module'.format(name), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _MODULES[path] = module
+    return _MODULES[path]
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = None
+
+    # Module run by this action plugin
+    MODULE = 'ovh_dns'
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        if self._connection.transport not in ('local', 'ovh_api'):
+            result.update(self._execute_module(task_vars=task_vars))
+            return result
+
+        path = find_module_source(self._shared_loader_obj.module_loader, self.MODULE)
+        if path is None:
+            result.update(self._execute_module(task_vars=task_vars))
+            return result
+        use_module_utils(self._shared_loader_obj.module_utils_loader)
+        try:
+            source = load_module(self.MODULE, path)
+        except SystemExit:
+            # The module exits when the ovh library is missing
+            result.update(failed=True, msg='ovh required for this module')
+            return result
+        except ImportError as e:
+            # module_utils/ of this repository is not in the module_utils path
+            result.update(failed=True, msg='{} could not be imported: {}'.format(self.MODULE, e))
+            return result
+        if not hasattr(source, 'run_module'):
+            # Not a module of this repository, run it the usual way
+            result.update(self._execute_module(task_vars=task_vars))
+            return result
+        # Imported along with the module source
+        from ansible.module_utils.ovh_api import InProcessModule, ModuleExit
+
+        validator = ArgumentSpecValidator(source.ARGUMENT_SPEC,
+                                          mutually_exclusive=getattr(source, 'MUTUALLY_EXCLUSIVE', None),
+                                          required_if=getattr(source, 'REQUIRED_IF', None))
+        # Modules get their arguments as JSON; do the same to drop any
+        # controller-side string types
+        validated = validator.validate(json.loads(json.dumps(self._task.args)))
+        if validated.error_messages:
+            result.update(failed=True, msg=', '.join(validated.error_messages))
+            return result
+
+        # ovh.Client() reads its credentials from the environment
+        variables = {}
+        self._compute_environment_string(variables)
+
+        module = InProcessModule(validated.validated_parameters,
+                                 check_mode=self._task.check_mode,
+                                 socket_path=getattr(self._connection, 'socket_path', None))
+        try:
+            with environment(variables):
+                source.run_module(module, source.get_client(module))
+        except ModuleExit as e:
+            result.update(e.results)
+        except Exception as e:
+            result.update(failed=True, msg='{} failed: {}'.format(self.MODULE, e),
+                          exception=traceback.format_exc())
+        return result
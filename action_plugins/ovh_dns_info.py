@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns_info, an Ansible module for reading OVH DNS records
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Run ovh_dns_info inside the controller process, like the ovh_dns
+action plugin next to this file does for ovh_dns."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import importlib.util
+import os
+
+# Action plugins are not importable from each other, load the ovh_dns one
+_spec = importlib.util.spec_from_file_location(
+    'ansible_ovh_dns_action', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ovh_dns.py'))
+_ovh_dns = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_ovh_dns)
+
+
+class ActionModule(_ovh_dns.ActionModule):
+
+    MODULE = 'ovh_dns_info'
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+# bench_ovh_dns, wall time and API calls of ovh_dns scenarios
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Benchmark ovh_dns against the fake OVH API.
+
+Each scenario runs the module logic in-process on a freshly generated
+zone, and reports its wall time and the API calls it made:
+
+    python benchmarks/bench_ovh_dns.py
+    python benchmarks/bench_ovh_dns.py --sizes 1000 --latency 0.02 --params '{"workers": 16}'
+
+Requires ansible and ovh, like the module itself.
+"""
+
+from __future__ import print_function
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import ansible.module_utils  # noqa: E402
+import ovh.client  # noqa: E402
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator  # noqa: E402
+
+# Like AnsiballZ, make module_utils/ importable as ansible.module_utils
+ansible.module_utils.__path__.append(os.path.join(os.path.dirname(HERE), 'module_utils'))
+
+from ansible.module_utils.ovh_api import InProcessModule, ModuleExit  # noqa: E402
+
+from fake_ovh import FakeOVH  # noqa: E402
+
+ZONE = 'example.com'
+
+# host1 is an A record pointing to 10.0.0.1 in generated zones
+SCENARIOS = [
+    ('present', dict(state='present', name='host1', type='A', value='10.0.0.1')),
+    ('append', dict(state='append', name='host1', type='A', value='10.200.0.1')),
+    ('replace', dict(state='present', name='host1', type='A', value='10.200.0.1', replace='10.0.0.1')),
+    ('absent', dict(state='absent', name='', type='A', removes='^host1$')),
+]
+
+
+def load_module(name):
+    """Import a module of the repository without running it"""
+    path = os.path.join(os.path.dirname(HERE), 'library', name + '.py')
+    spec = importlib.util.spec_from_file_location('bench_' + name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def use_server(server):
+    """Send the API calls of ovh.Client() to the fake server"""
+    ovh.client.ENDPOINTS['fake-ovh'] = server.url
+    os.environ.update(OVH_ENDPOINT='fake-ovh', OVH_APPLICATION_KEY='bench',
+                      OVH_APPLICATION_SECRET='bench', OVH_CONSUMER_KEY='bench')
+
+
+def run_module(module, params, check_mode=False, wrap=None):
+    """Run the logic of ovh_dns or ovh_reverse in-process, return its
+    results. 'wrap' may decorate the API client the module gets"""
+    validated = ArgumentSpecValidator(
+        module.ARGUMENT_SPEC,
+        mutually_exclusive=getattr(module, 'MUTUALLY_EXCLUSIVE', None),
+        required_if=getattr(module, 'REQUIRED_IF', None)).validate(params)
+    if validated.error_messages:
+        raise ValueError(', '.join(validated.error_messages))
+
+    instance = InProcessModule(validated.validated_parameters, check_mode=check_mode)
+    client = module.get_client(instance)
+    if wrap is not None:
+        client = wrap(client)
+    try:
+        module.run_module(instance, client)
+    except ModuleExit as e:
+        return e.results
+    raise RuntimeError('module did not exit')
+
+
+def run_scenario(ovh_dns, server, size, params):
+    """Run ovh_dns on a new zone of 'size' records; return the wall time,
+    the results and the API calls"""
+    server.add_zone(ZONE, size)
+    server.reset_stats()
+    start = time.time()
+    results = run_module(ovh_dns, dict(params, domain=ZONE))
+    return time.time() - start, results, dict(server.calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,10000',
+                        help='comma separated zone sizes (default: %(default)s)')
+    parser.add_argument('--scenarios', default=','.join(name for name, params in SCENARIOS),
+                        help='comma separated scenarios (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every API request (default: %(default)s)')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='rate of API requests answered with 429 (default: %(default)s)')
+    parser.add_argument('--params', default='{}',
+                        help='extra ovh_dns parameters, as JSON')
+    parser.add_argument('--json', action='store_true',
+                        help='print one JSON object per run instead of a table')
+    args = parser.parse_args()
+
+    ovh_dns = load_module('ovh_dns')
+    extra = json.loads(args.params)
+    server = FakeOVH(latency=args.latency, throttle=args.throttle).start()
+    use_server(server)
+
+    if not args.json:
+        print('{:<10} {:>7} {:>9} {:>7} {:>7} {:>6} {:>5} {:>7}'.format(
+            'scenario', 'size', 'wall (s)', 'calls', 'GET', 'POST', 'PUT', 'DELETE'))
+    try:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            for name, params in SCENARIOS:
+                if name not in args.scenarios.split(','):
+                    continue
+                wall, results, calls = run_scenario(ovh_dns, server, size, dict(params, **extra))
+                if results.get('failed'):
+                    print('{} on {} records failed: {}'.format(name, size, results.get('msg')),
+                          file=sys.stderr)
+                by_method = dict((method, sum(count for (m, path), count in calls.items() if m == method))
+                                 for method in ('GET', 'POST', 'PUT', 'DELETE'))
+                if args.json:
+                    print(json.dumps(dict(scenario=name, size=size, wall=wall,
+                                          calls=sum(calls.values()), by_method=by_method,
+                                          by_endpoint=dict(('{} {}'.format(*key), count)
+                                                           for key, count in calls.items()),
+                                          changed=results.get('changed'))))
+                else:
+                    print('{:<10} {:>7} {:>9.3f} {:>7} {:>7} {:>6} {:>5} {:>7}'.format(
+                        name, size, wall, sum(calls.values()), by_method['GET'],
+                        by_method['POST'], by_method['PUT'], by_method['DELETE']))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+# check_call_budget, upper bounds on the API calls made by the modules
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Check the API calls of ovh_dns and ovh_reverse against their budget.
+
+Each check runs the module logic in-process against the fake OVH API,
+counts the get/post/put/delete calls made on the client, and fails when
+they exceed the budget of the scenario. It exits with 1 when any check
+fails, so that it can run in CI:
+
+    python benchmarks/check_call_budget.py
+    python benchmarks/check_call_budget.py --verbose
+
+Requires ansible and ovh, like the modules themselves.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_ovh_dns import ZONE, load_module, run_module, use_server  # noqa: E402
+from fake_ovh import FakeOVH, endpoint_template  # noqa: E402
+
+# Every check runs on a new zone of 'size' records, where host1 is an A
+# record pointing to 10.0.0.1, and 10.0.0.1 has host1.example.com. as its
+# reverse. 'warmup' runs the same parameters once before counting, 'prepare'
+# runs other parameters first; 'plan' stands for a plan file of the check.
+# 'expect' lists (name, type, value) records the zone must hold afterwards.
+CHECKS = [
+    dict(name='idempotent present on a 1k zone', budget=3, size=1000,
+         params=dict(state='present', name='host1', type='A', value='10.0.0.1')),
+    dict(name='idempotent present on a 1k zone, export fetch', budget=2, size=1000,
+         params=dict(state='present', name='host1', type='A', value='10.0.0.1', fetch='export')),
+    dict(name='idempotent present on a 1k zone, warm cache', budget=2, size=1000, warmup=True,
+         params=dict(state='present', name='host1', type='A', value='10.0.0.1', cache=True)),
+    dict(name='idempotent present on a 1k zone, check mode', budget=3, size=1000, check_mode=True,
+         params=dict(state='present', name='host1', type='A', value='10.0.0.1')),
+    dict(name='create on a 1k zone', budget=4, size=1000,
+         params=dict(state='present', name='new', type='A', value='10.200.0.1')),
+    dict(name='create on a 1k zone, deferred refresh', budget=3, size=1000,
+         params=dict(state='present', name='new', type='A', value='10.200.0.1', refresh='deferred')),
+    dict(name='append on a 1k zone', budget=5, size=1000,
+         params=dict(state='append', name='host1', type='A', value='10.200.0.1')),
+    dict(name='replace on a 1k zone', budget=5, size=1000,
+         params=dict(state='present', name='host1', type='A', value='10.200.0.1', replace='10.0.0.1')),
+    dict(name='absent by name on a 1k zone', budget=5, size=1000,
+         params=dict(state='absent', name='host1', type='A')),
+    dict(name='idempotent records list on a 1k zone, export fetch', budget=2, size=1000,
+         params=dict(fetch='export', records=[dict(name='host1', type='A', value='10.0.0.1'),
+                                              dict(name='host2', type='A', value='10.0.0.2')])),
+    dict(name='idempotent SPF present on a 1k zone, export fetch', budget=3, size=1000,
+         prepare=dict(state='present', name='mail', type='SPF', value='"v=spf1 include:mx.ovh.com ~all"'),
+         params=dict(state='present', name='mail', type='SPF', value='"v=spf1 include:mx.ovh.com ~all"',
+                     fetch='export')),
+    dict(name='TXT absent next to an SPF record on a 1k zone, export fetch', budget=5, size=1000,
+         prepare=dict(state='present', name='mail', type='SPF', value='"v=spf1 include:mx.ovh.com ~all"'),
+         params=dict(state='absent', name='mail', type='TXT', fetch='export')),
+    # The ids are listed, and the updated record read again before its PUT
+    # OVH ignores an empty subDomain filter: the apex record must not be
+    # mistaken for www, which has the same target
+    dict(name='update the apex next to www with the same target, export fetch', budget=15,
+         prepare=dict(records=[dict(name='www', type='A', value='213.186.33.5'),
+                               dict(name='', type='A', value='213.186.33.5')]),
+         params=dict(fetch='export', records=[dict(name='', type='A', value='9.9.9.9')]),
+         expect=[('', 'A', '9.9.9.9'), ('www', 'A', '213.186.33.5')]),
+    dict(name='apply a plan on an unchanged 1k zone', budget=4, size=1000,
+         prepare=dict(plan=True, records=[dict(name='host1', type='A', value='10.200.0.1')]),
+         params=dict(state='apply', plan=True)),
+    dict(name='reverse unchanged', module='ovh_reverse', budget=2,
+         params=dict(ip='10.0.0.1', reverse='host1.example.com.')),
+    dict(name='reverse update', module='ovh_reverse', budget=3,
+         params=dict(ip='10.0.0.1', reverse='other.example.com.')),
+    dict(name='reverse absent', module='ovh_reverse', budget=3,
+         params=dict(ip='10.0.0.1', state='absent')),
+    dict(name='reverses unchanged in a block', module='ovh_reverse', budget=2,
+         params=dict(ips=[dict(ip='10.0.0.1', reverse='host1.example.com.'),
+                          dict(ip='10.0.0.2', state='absent')], block='10.0.0.0/24')),
+]
+
+
+class CountingClient(object):
+    """Wrap an API client, counting its calls by method and endpoint"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Retry counters and the like of the wrapped client
+        return getattr(self.client, name)
+
+    def count(self, method, path, params):
+        with self.lock:
+            self.calls[(method.upper(), endpoint_template(path))] += 1
+        return getattr(self.client, method)(path, **params)
+
+    def get(self, path, **params):
+        return self.count('get', path, params)
+
+    def post(self, path, **params):
+        return self.count('post', path, params)
+
+    def put(self, path, **params):
+        return self.count('put', path, params)
+
+    def delete(self, path, **params):
+        return self.count('delete', path, params)
+
+
+def run_check(modules, check, tmpdir):
+    """Run one check on a new fake server; return the results, the calls
+    and the expected records missing from the zone"""
+    name = check.get('module', 'ovh_dns')
+    module = modules[name]
+    params = dict(check['params'])
+    prepare = dict(check.get('prepare', {}))
+    if name == 'ovh_dns':
+        for p in (params, prepare):
+            p.update(domain=ZONE, cache_path=os.path.join(tmpdir, 'cache.db'),
+                     refresh_queue=os.path.join(tmpdir, 'refresh_queue'))
+            if p.get('plan'):
+                p['plan'] = os.path.join(tmpdir, 'plan')
+
+    server = FakeOVH().start()
+    try:
+        use_server(server)
+        server.add_zone(ZONE, check.get('size', 10))
+        server.add_reverse('10.0.0.1', 'host1.example.com.')
+        if check.get('warmup'):
+            run_module(module, params)
+        if check.get('prepare'):
+            run_module(module, prepare)
+        counting = []
+
+        def wrap(client):
+            counting.append(CountingClient(client))
+            return counting[-1]
+
+        results = run_module(module, params, check_mode=check.get('check_mode', False), wrap=wrap)
+        records = [(record['subDomain'], record['fieldType'], record['target'])
+                   for record in server.zones[ZONE].values()]
+    finally:
+        server.stop()
+    return results, counting[0].calls, [record for record in check.get('expect', []) if record not in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true',
+                        help='list the calls of every check')
+    args = parser.parse_args()
+
+    modules = dict(ovh_dns=load_module('ovh_dns'), ovh_reverse=load_module('ovh_reverse'))
+    failed = 0
+    for check in CHECKS:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            results, calls, missing = run_check(modules, check, tmpdir)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        total = sum(calls.values())
+        if results.get('failed'):
+            status = 'FAIL'
+            reason = ' (module failed: {})'.format(results.get('msg'))
+        elif missing:
+            status = 'FAIL'
+            reason = ' (zone misses {})'.format(missing)
+        elif total > check['budget']:
+            status = 'FAIL'
+            reason = ''
+        else:
+            status = 'ok'
+            reason = ''
+        failed += status == 'FAIL'
+        print('{:<4} {:>3} / {:<3} {}{}'.format(status, total, check['budget'], check['name'], reason))
+        if args.verbose or status == 'FAIL':
+            for (method, endpoint), count in sorted(calls.items()):
+                print('{:>14} {:<7} {}'.format(count, method, endpoint))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# check_zone_export, parser checks against a zone exported by OVH
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Check the zone export parser against a zone as exported by OVH.
+
+The export below is laid out like the ones of /domain/zone/{zone}/export:
+blank owners, multi-line SOA, SPF and DKIM records written as TXT, quoted
+strings holding ';' and parentheses. It exits with 1 when any record is not
+parsed as expected:
+
+    python benchmarks/check_zone_export.py
+
+Requires ansible, like the modules themselves.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+import ansible.module_utils  # noqa: E402
+
+ansible.module_utils.__path__.append(os.path.join(os.path.dirname(HERE), 'module_utils'))
+
+from ansible.module_utils.ovh_dns_records import parse_zone_export, txt_value  # noqa: E402
+
+ZONE = 'example.com'
+
+EXPORT = '''$TTL 3600
+@\tIN SOA dns200.anycast.me. tech.ovh.net. (2024011503 86400 3600 3600000 60)
+                      IN NS     dns200.anycast.me.
+                      IN NS     ns200.anycast.me.
+                      IN MX     1 mx1.mail.ovh.net.
+                      IN MX     5 mx2.mail.ovh.net.
+                      IN A      213.186.33.5
+                  600 IN TXT    "v=spf1 include:mx.ovh.com ~all"
+                      IN CAA    0 issue "letsencrypt.org"
+_autodiscover._tcp    IN SRV    0 0 443 mailconfig.ovh.net.
+_dmarc                IN TXT    "v=DMARC1; p=none; rua=mailto:dmarc@example.com"
+autoconfig            IN CNAME  mailconfig.ovh.net.
+ovh1._domainkey       IN TXT    ( "v=DKIM1;t=s;p=MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC"
+                                  "7vbqajDw4o6gJy8UtmIbkcpnkO3Kq9q0LHGu" )
+www                   IN A      213.186.33.5
+www                   IN AAAA   2001:41d0:301::21
+www                   IN TXT    "3|welcome (to the; site)"
+*.dev          300    IN CNAME  www
+ftp.example.com.      IN CNAME  example.com.
+'''
+
+EXPECTED = [
+    ('', 'NS', 'dns200.anycast.me.', 0),
+    ('', 'NS', 'ns200.anycast.me.', 0),
+    ('', 'MX', '1 mx1.mail.ovh.net.', 0),
+    ('', 'MX', '5 mx2.mail.ovh.net.', 0),
+    ('', 'A', '213.186.33.5', 0),
+    ('', 'TXT', '"v=spf1 include:mx.ovh.com ~all"', 600),
+    ('', 'CAA', '0 issue "letsencrypt.org"', 0),
+    ('_autodiscover._tcp', 'SRV', '0 0 443 mailconfig.ovh.net.', 0),
+    ('_dmarc', 'TXT', '"v=DMARC1; p=none; rua=mailto:dmarc@example.com"', 0),
+    ('autoconfig', 'CNAME', 'mailconfig.ovh.net.', 0),
+    ('ovh1._domainkey', 'TXT', '"v=DKIM1;t=s;p=MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC" '
+                               '"7vbqajDw4o6gJy8UtmIbkcpnkO3Kq9q0LHGu"', 0),
+    ('www', 'A', '213.186.33.5', 0),
+    ('www', 'AAAA', '2001:41d0:301::21', 0),
+    ('www', 'TXT', '"3|welcome (to the; site)"', 0),
+    ('*.dev', 'CNAME', 'www', 300),
+    ('ftp', 'CNAME', 'example.com.', 0),
+]
+
+# Targets of the API records matching the TXT lines of the export
+TXT_VALUES = [
+    ('"v=spf1 include:mx.ovh.com ~all"', 'v=spf1 include:mx.ovh.com ~all'),
+    ('"v=DKIM1;t=s;p=MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC" "7vbqajDw4o6gJy8UtmIbkcpnkO3Kq9q0LHGu"',
+     'v=DKIM1;t=s;p=MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC7vbqajDw4o6gJy8UtmIbkcpnkO3Kq9q0LHGu'),
+    ('v=spf1 -all', 'v=spf1 -all'),
+]
+
+
+def check(name, expected, actual):
+    """Print the outcome of a check; return whether it failed"""
+    if expected == actual:
+        print('ok   {}'.format(name))
+        return False
+    print('FAIL {}\n     expected {!r}\n     got      {!r}'.format(name, expected, actual))
+    return True
+
+
+def main():
+    records, unparsed = parse_zone_export(EXPORT, ZONE)
+    parsed = [(record['subDomain'], record['fieldType'], record['target'], record['ttl'])
+              for record in records]
+
+    failed = check('no unparsed line', [], unparsed)
+    for i, expected in enumerate(EXPECTED):
+        failed |= check('record {} {} {}'.format(*expected[:3]), expected,
+                        parsed[i] if i < len(parsed) else None)
+    failed |= check('record count', len(EXPECTED), len(parsed))
+
+    failed |= check('truncated line is reported', ['www IN A'],
+                    parse_zone_export('www IN A\nftp IN CNAME www\n', ZONE)[1])
+
+    for target, value in TXT_VALUES:
+        failed |= check('TXT value of {}'.format(target[:24]), value, txt_value(target))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
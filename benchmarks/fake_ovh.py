@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+# fake_ovh, a stand-in for the OVH API endpoints used by the modules
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""In-memory stand-in for the OVH API endpoints used by the modules.
+
+It serves /domain/zone/* and /ip/*/reverse over HTTP on localhost, with
+an optional latency added to every request and an optional rate of
+requests answered with 429. Requests are not authenticated, and every
+call is counted by method and endpoint template.
+
+    server = FakeOVH(latency=0.01)
+    server.add_zone('example.com', size=1000)
+    server.start()
+    ... point an ovh.Client at server.url ...
+    print(server.calls)
+    server.stop()
+"""
+
+from __future__ import print_function
+
+import ipaddress
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, unquote, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import parse_qs, urlparse
+
+
+def endpoint_template(path):
+    """Turn a request path into the endpoint it belongs to, such as
+    /domain/zone/{zone}/record/{id}"""
+    path = re.sub(r'^/domain/zone/[^/]+', '/domain/zone/{zone}', path)
+    path = re.sub(r'/record/\d+$', '/record/{id}', path)
+    path = re.sub(r'^/ip/[^/]+/reverse', '/ip/{ip}/reverse', path)
+    return re.sub(r'/reverse/[^/]+$', '/reverse/{ipReverse}', path)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Concurrent clients open a connection per request
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def handle_method(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        path = url.path[len('/1.0'):] if url.path.startswith('/1.0') else url.path
+        query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+
+        if path != '/auth/time':
+            fake.count(method, path)
+            if fake.latency:
+                time.sleep(fake.latency)
+            if fake.throttle and random.random() < fake.throttle:
+                fake.count_throttled()
+                return self.reply(429, {'message': 'Too many requests'})
+
+        with fake.lock:
+            status, body = fake.dispatch(method, path, query, self.body())
+        self.reply(status, body)
+
+    def do_GET(self):
+        self.handle_method('GET')
+
+    def do_POST(self):
+        self.handle_method('POST')
+
+    def do_PUT(self):
+        self.handle_method('PUT')
+
+    def do_DELETE(self):
+        self.handle_method('DELETE')
+
+
+class FakeOVH(object):
+    """In-memory OVH API serving zones and reverses on localhost"""
+
+    def __init__(self, latency=0, throttle=0):
+        self.latency = latency
+        self.throttle = throttle
+        self.zones = {}
+        self.reverses = {}
+        self.calls = Counter()
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.httpd = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/1.0'.format(self.httpd.server_address[1])
+
+    def start(self):
+        self.httpd = _Server(('127.0.0.1', 0), _Handler)
+        self.httpd.fake = self
+        thread = threading.Thread(target=self.httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # Data
+
+    def add_record(self, zone, subdomain, fieldtype, target, ttl=0):
+        record = dict(id=self.next_id, zone=zone, subDomain=subdomain,
+                      fieldType=fieldtype, target=target, ttl=ttl)
+        self.zones.setdefault(zone, {})[self.next_id] = record
+        self.next_id += 1
+        return record
+
+    def add_zone(self, zone, size=0):
+        """Create a zone of 'size' records: NS and MX at the apex, then
+        A records host0, host1... and a TXT record every tenth host"""
+        self.zones[zone] = {}
+        self.add_record(zone, '', 'NS', 'dns10.ovh.net.')
+        self.add_record(zone, '', 'MX', '1 mx1.ovh.net.')
+        for i in range(max(0, size - 2)):
+            if i % 10 == 9:
+                self.add_record(zone, 'host{}'.format(i), 'TXT', '"record {}"'.format(i), 3600)
+            else:
+                self.add_record(zone, 'host{}'.format(i), 'A',
+                                '10.{}.{}.{}'.format(i // 65536 % 256, i // 256 % 256, i % 256), 3600)
+
+    def add_reverse(self, ip, reverse):
+        self.reverses[ip] = reverse
+
+    # Statistics
+
+    def count(self, method, path):
+        with self.lock:
+            self.calls[(method, endpoint_template(path))] += 1
+
+    def count_throttled(self):
+        with self.lock:
+            self.throttled += 1
+
+    def reset_stats(self):
+        with self.lock:
+            self.calls = Counter()
+            self.throttled = 0
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    # API
+
+    def dispatch(self, method, path, query, body):
+        if path == '/auth/time':
+            return 200, int(time.time())
+        if path == '/domain/zone':
+            return 200, sorted(self.zones)
+
+        match = re.match(r'^/domain/zone/([^/]+)(/.*)?$', path)
+        if match:
+            return self.zone_call(method, match.group(1), match.group(2) or '', query, body)
+
+        match = re.match(r'^/ip/([^/]+)/reverse(?:/([^/]+))?$', path)
+        if match:
+            return self.reverse_call(method, unquote(match.group(1)),
+                                     match.group(2) and unquote(match.group(2)), body)
+
+        return 404, {'message': 'Unknown endpoint {} {}'.format(method, path)}
+
+    def zone_call(self, method, zone, rest, query, body):
+        if zone not in self.zones:
+            return 404, {'message': 'This service does not exist'}
+        records = self.zones[zone]
+
+        if rest == '' and method == 'GET':
+            return 200, {'name': zone, 'hasDnsAnycast': False}
+        if rest == '/refresh' and method == 'POST':
+            return 200, None
+        if rest == '/export' and method == 'GET':
+            return 200, self.export(zone)
+        if rest == '/record' and method == 'GET':
+            return 200, [record['id'] for record in records.values()
+                         if (not query.get('subDomain') or record['subDomain'] == query['subDomain'])
+                         and (not query.get('fieldType') or record['fieldType'] == query['fieldType'])]
+        if rest == '/record' and method == 'POST':
+            return 200, self.add_record(zone, body.get('subDomain', ''), body['fieldType'],
+                                        body['target'], body.get('ttl', 0))
+
+        match = re.match(r'^/record/(\d+)$', rest)
+        if match:
+            record_id = int(match.group(1))
+            if record_id not in records:
+                return 404, {'message': 'The requested object (id = {}) does not exist'.format(record_id)}
+            if method == 'GET':
+                return 200, records[record_id]
+            if method == 'PUT':
+                for key in ('subDomain', 'target', 'ttl'):
+                    if key in body:
+                        records[record_id][key] = body[key]
+                return 200, None
+            if method == 'DELETE':
+                del records[record_id]
+                return 200, None
+
+        return 404, {'message': 'Unknown endpoint {} /domain/zone/{}{}'.format(method, zone, rest)}
+
+    def export(self, zone):
+        lines = ['$TTL 3600',
+                 '@\tIN SOA dns10.ovh.net. tech.ovh.net. (2024010100 86400 3600 3600000 300)']
+        for record in sorted(self.zones[zone].values(), key=lambda r: r['id']):
+            # Like OVH, export SPF and DKIM records as TXT
+            fieldtype = 'TXT' if record['fieldType'] in ('SPF', 'DKIM') else record['fieldType']
+            lines.append('{}\t{}\tIN {}\t{}'.format(record['subDomain'] or '@', record['ttl'] or '',
+                                                  fieldtype, record['target']))
+        return '\n'.join(lines) + '\n'
+
+    def reverse_call(self, method, block, ip, body):
+        network = ipaddress.ip_network(u'{}'.format(block), strict=False)
+        in_block = sorted(address for address in self.reverses
+                          if ipaddress.ip_address(u'{}'.format(address)) in network)
+
+        if ip is None and method == 'GET':
+            return 200, in_block
+        if ip is None and method == 'POST':
+            self.reverses[body['ipReverse']] = body['reverse']
+            return 200, dict(ipReverse=body['ipReverse'], reverse=body['reverse'])
+        if ip not in in_block:
+            return 404, {'message': 'The requested object (ipReverse = {}) does not exist'.format(ip)}
+        if method == 'GET':
+            return 200, dict(ipReverse=ip, reverse=self.reverses[ip])
+        if method == 'DELETE':
+            del self.reverses[ip]
+            return 200, None
+
+        return 404, {'message': 'Unknown endpoint {} /ip/{}/reverse'.format(method, block)}
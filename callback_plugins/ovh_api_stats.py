@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# ovh_api_stats, an Ansible callback plugin summing up OVH API usage
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+name: ovh_api_stats
+type: aggregate
+author: Carlos Izquierdo
+short_description: Sum up the OVH API usage of ovh_dns and ovh_reverse tasks
+description:
+    - Adds up the 'api_stats' returned by ovh_dns, ovh_dns_refresh and
+      ovh_reverse, and prints at the end of the playbook the API calls per
+      zone, the retries, the throttled (HTTP 429 or 503) calls, the zone
+      refreshes and the slowest endpoints.
+    - Optionally writes the same figures as a Prometheus textfile, for the
+      textfile collector of node_exporter.
+requirements:
+    - enable in configuration
+options:
+    textfile:
+        description:
+            - Path of the Prometheus textfile to write; nothing is written
+              when not set
+        env:
+            - name: OVH_API_STATS_TEXTFILE
+        ini:
+            - section: callback_ovh_api_stats
+              key: textfile
+    slowest:
+        type: int
+        default: 5
+        description:
+            - Number of endpoints listed in the slowest endpoints summary
+        env:
+            - name: OVH_API_STATS_SLOWEST
+        ini:
+            - section: callback_ovh_api_stats
+              key: slowest
+'''
+
+EXAMPLES = '''
+# ansible.cfg
+[defaults]
+callbacks_enabled = ovh_api_stats
+
+[callback_ovh_api_stats]
+textfile = /var/lib/node_exporter/textfile/ovh_api.prom
+'''
+
+import os
+import tempfile
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+    """Sum the api_stats of every task result, print them when the
+    playbook ends and write them as a Prometheus textfile"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'ovh_api_stats'
+    CALLBACK_NEEDS_ENABLED = True
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self.tasks = 0
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.refreshes = 0
+        self.zones = {}
+        self.endpoints = {}
+
+    def add_stats(self, stats):
+        self.tasks += 1
+        self.calls += stats.get('calls', 0)
+        self.retries += stats.get('retries', 0)
+        self.throttled += stats.get('throttled', 0)
+        self.refreshes += stats.get('refreshes', 0)
+        for zone, calls in stats.get('zones', {}).items():
+            self.zones[zone] = self.zones.get(zone, 0) + calls
+        for key, endpoint in stats.get('endpoints', {}).items():
+            total = self.endpoints.setdefault(key, dict(count=0, total=0.0, max=0.0))
+            total['count'] += endpoint.get('count', 0)
+            total['total'] += endpoint.get('total', 0)
+            total['max'] = max(total['max'], endpoint.get('max', 0))
+
+    def add_result(self, result):
+        # Loops hold one result per item
+        for item in [result._result] + list(result._result.get('results') or []):
+            if isinstance(item, dict) and isinstance(item.get('api_stats'), dict):
+                self.add_stats(item['api_stats'])
+
+    def v2_runner_on_ok(self, result):
+        self.add_result(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.add_result(result)
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.tasks:
+            return
+
+        self._display.banner('OVH API STATS')
+        self._display.display('{} calls in {} tasks, {} retries, {} throttled (429/503), {} zone refreshes'.format(
+            self.calls, self.tasks, self.retries, self.throttled, self.refreshes))
+        if self.zones:
+            self._display.display('Calls per zone:')
+            for zone in sorted(self.zones, key=lambda zone: -self.zones[zone]):
+                self._display.display('  {:<40} {:>8}'.format(zone, self.zones[zone]))
+        if self.endpoints:
+            self._display.display('Slowest endpoints (mean / max seconds, calls):')
+            slowest = sorted(self.endpoints, reverse=True,
+                             key=lambda key: self.endpoints[key]['total'] / max(1, self.endpoints[key]['count']))
+            for key in slowest[:self.get_option('slowest')]:
+                endpoint = self.endpoints[key]
+                self._display.display('  {:<50} {:>8.3f} {:>8.3f} {:>8}'.format(
+                    key, endpoint['total'] / max(1, endpoint['count']), endpoint['max'], endpoint['count']))
+
+        if self.get_option('textfile'):
+            self.write_textfile(os.path.expanduser(self.get_option('textfile')))
+
+    def write_textfile(self, path):
+        """Write the stats in the Prometheus text format, replacing the file
+        atomically so that the collector never reads a partial file"""
+        lines = []
+
+        def metric(name, help, samples):
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} gauge'.format(name))
+            for labels, value in samples:
+                labels = ','.join('{}="{}"'.format(label, escape(labels[label])) for label in sorted(labels))
+                lines.append('{}{} {}'.format(name, '{' + labels + '}' if labels else '', value))
+
+        metric('ovh_api_calls', 'OVH API calls made by the last playbook run',
+               [({}, self.calls)])
+        metric('ovh_api_zone_calls', 'OVH API calls per DNS zone in the last playbook run',
+               [(dict(zone=zone), self.zones[zone]) for zone in sorted(self.zones)])
+        metric('ovh_api_retries', 'OVH API calls retried in the last playbook run',
+               [({}, self.retries)])
+        metric('ovh_api_throttled', 'OVH API calls throttled (HTTP 429 or 503) in the last playbook run',
+               [({}, self.throttled)])
+        metric('ovh_api_refreshes', 'OVH DNS zone refreshes issued by the last playbook run',
+               [({}, self.refreshes)])
+        endpoints = []
+        for key in sorted(self.endpoints):
+            method, endpoint = key.split(' ', 1)
+            endpoints.append((dict(method=method, endpoint=endpoint), self.endpoints[key]))
+        metric('ovh_api_endpoint_calls', 'OVH API calls per endpoint in the last playbook run',
+               [(labels, total['count']) for labels, total in endpoints])
+        metric('ovh_api_endpoint_seconds', 'Seconds spent in OVH API calls per endpoint in the last playbook run',
+               [(labels, round(total['total'], 4)) for labels, total in endpoints])
+        metric('ovh_api_endpoint_max_seconds', 'Slowest OVH API call per endpoint in the last playbook run',
+               [(labels, round(total['max'], 4)) for labels, total in endpoints])
+        metric('ovh_api_last_run_timestamp_seconds', 'End of the last playbook run',
+               [({}, int(time.time()))])
+
+        directory = os.path.dirname(path) or '.'
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.ovh_api_stats')
+            with os.fdopen(fd, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.chmod(tmp, 0o644)
+            os.rename(tmp, path)
+        except (IOError, OSError) as e:
+            self._display.warning('Could not write OVH API stats to {}: {}'.format(path, e))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
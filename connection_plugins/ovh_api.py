@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# ovh_api, an Ansible connection plugin keeping an OVH API session open
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+name: ovh_api
+author: Carlos Izquierdo
+short_description: Persistent OVH API session for ovh_dns and ovh_reverse
+description:
+    - Keeps a single authenticated OVH API client, with its keep-alive HTTPS
+      session and the server time delta used to sign requests, for the whole
+      play. ovh_dns and ovh_reverse send their API calls through it instead
+      of connecting on each task.
+    - Modules still run on the controller.
+    - The session answers one API call at a time, so the concurrent requests
+      of 'workers' are serialized through it. Use the local connection for
+      tasks whose speed comes from 'workers', such as large zone fetches,
+      'zones' or batches of reverses.
+requirements: [ "ovh" ]
+options:
+    endpoint:
+        description:
+            - OVH API endpoint, such as ovh-eu. Read from the ovh configuration when not set
+        env:
+            - name: OVH_ENDPOINT
+        vars:
+            - name: ansible_ovh_endpoint
+    application_key:
+        description:
+            - OVH application key
+        env:
+            - name: OVH_APPLICATION_KEY
+        vars:
+            - name: ansible_ovh_application_key
+    application_secret:
+        description:
+            - OVH application secret
+        env:
+            - name: OVH_APPLICATION_SECRET
+        vars:
+            - name: ansible_ovh_application_secret
+    consumer_key:
+        description:
+            - OVH consumer key
+        env:
+            - name: OVH_CONSUMER_KEY
+        vars:
+            - name: ansible_ovh_consumer_key
+    persistent_connect_timeout:
+        type: int
+        default: 30
+        description:
+            - Seconds the session stays open without any task using it
+        ini:
+            - section: persistent_connection
+              key: connect_timeout
+        env:
+            - name: ANSIBLE_PERSISTENT_CONNECT_TIMEOUT
+        vars:
+            - name: ansible_connect_timeout
+    persistent_command_timeout:
+        type: int
+        default: 30
+        description:
+            - Seconds to wait for a single API call
+        ini:
+            - section: persistent_connection
+              key: command_timeout
+        env:
+            - name: ANSIBLE_PERSISTENT_COMMAND_TIMEOUT
+        vars:
+            - name: ansible_command_timeout
+    persistent_log_messages:
+        type: boolean
+        default: false
+        description:
+            - Log every API call in the Ansible log file
+        ini:
+            - section: persistent_connection
+              key: log_messages
+        env:
+            - name: ANSIBLE_PERSISTENT_LOG_MESSAGES
+        vars:
+            - name: ansible_persistent_log_messages
+'''
+
+EXAMPLES = '''
+- name: OVH DNS playbook
+  hosts: localhost
+  connection: ovh_api
+  gather_facts: false
+  tasks:
+    - ovh_dns: state=present domain=mydomain.com name=db1 type=A value=10.10.10.10
+    - ovh_reverse: ip=10.10.10.10 state=present reverse=db1.mydomain.com.
+'''
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.plugins.connection import NetworkConnectionBase
+
+try:
+    import ovh
+    HAS_OVH = True
+except ImportError:
+    HAS_OVH = False
+
+
+class Connection(NetworkConnectionBase):
+    """Persistent connection holding an authenticated ovh.Client"""
+
+    transport = 'ovh_api'
+    has_pipelining = False
+
+    def __init__(self, play_context, *args, **kwargs):
+        super(Connection, self).__init__(play_context, *args, **kwargs)
+        self._client = None
+
+    def _connect(self):
+        if not HAS_OVH:
+            raise AnsibleConnectionFailure('ovh required for the ovh_api connection')
+        if self._client is None:
+            self._client = ovh.Client(
+                endpoint=self.get_option('endpoint'),
+                application_key=self.get_option('application_key'),
+                application_secret=self.get_option('application_secret'),
+                consumer_key=self.get_option('consumer_key'),
+            )
+            # Query the server time once, every later request is signed with it
+            self._client.time_delta
+            self.queue_message('vvvv', 'OVH API session opened')
+        self._connected = True
+
+    def api_call(self, method, path, params=None):
+        """Send a call to the OVH API. Errors are returned rather than raised,
+        so that the module can raise the same ovh exception"""
+        if self._client is None:
+            self._connect()
+        self._log_messages('{} {}'.format(method, path))
+        try:
+            call = getattr(self._client, method.lower())
+            return {'result': call(path, **(params or {}))}
+        except ovh.exceptions.APIError as e:
+            response = getattr(e, 'response', None)
+            return {
+                'error': type(e).__name__,
+                'message': e.args[0] if e.args else str(e),
+                'status': response.status_code if response is not None else None,
+                'retry_after': response.headers.get('Retry-After') if response is not None else None,
+            }
+
+    def close(self):
+        self._client = None
+        super(Connection, self).close()
@@ -0,0 +1,1154 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns, an Ansible module for managing OVH DNS records
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import print_function
+
+DOCUMENTATION = '''
+---
+module: ovh_dns
+author: Carlos Izquierdo
+short_description: Manage OVH DNS records
+description:
+    - Manage OVH (French European hosting provider) DNS records
+requirements: [ "ovh" ]
+options:
+    create:
+        required: false
+        description:
+            - If 'state' == 'present' and 'replace' is not empty then create the record
+    domain:
+        required: true unless state is decommission, or zones or zones_regex is used
+        description:
+            - Name of the domain zone
+            - With 'decommission', only this zone is searched instead of all
+              the zones of the account
+    zones:
+        required: false
+        description:
+            - List of zones to run the task on instead of 'domain', with
+              'present', 'absent' and 'append'. Zones are processed
+              concurrently, sharing one API client and its rate limiting;
+              results are returned per zone in 'zones' and the diff has one
+              entry per changed zone
+    zones_regex:
+        required: false
+        description:
+            - Like 'zones', for every zone of the account whose name fully
+              matches this regex
+    name:
+        required: true unless records is used
+        description:
+            - Name of the DNS record
+    records:
+        required: false
+        description:
+            - List of records to reconcile in a single pass, instead of
+              'name', 'type' and 'value'. Each item takes 'name', 'type',
+              'value', and optionally 'ttl' and 'state' (both default to the
+              module ones)
+            - For each name and type holding a 'present' item, the listed
+              values become the only records of that name and type
+            - The zone is read once, every change is applied and the zone is
+              refreshed once
+    value:
+        required: true if present/append/decommission
+        description:
+            - Value of the DNS record (i.e. what it points to)
+            - If None with 'present' then deletes ALL records at 'name'
+            - With 'decommission', a regex which must match the whole target
+              of the records to delete (case insensitive). Patterns matching
+              any two unrelated addresses or host names, such as '.*' or
+              '[0-9.]+', are refused
+    removes:
+        required: false
+        description:
+            - specifies a regex pattern to match for bulk deletion
+    replace:
+        required: true if present and multi records found
+            - Old value of the DNS record (i.e. what it points to now)
+            - Accept regex
+            - The first matching record is updated in place, the other ones
+              are deleted
+    ttl:
+        required: false
+        description:
+            - value of record TTL value in seconds (defaults to 3600) 
+    type:
+        required: true if present/append
+        choices: ['A', 'AAAA', 'CAA', 'CNAME', 'DKIM', 'LOC', 'MX', 'NAPTR', 'NS', 'PTR', 'SPF', 'SRV', 'SSHFP', 'TLSA', 'TXT']
+        description:
+            - Type of DNS record (A, AAAA, PTR, CNAME, etc.)
+    state:
+        required: false
+        default: present
+        choices: ['present', 'absent', 'append', 'decommission', 'apply']
+        description:
+            - Determines wether the record is to be created/modified or deleted
+            - 'decommission' deletes every record, whatever its name, whose
+              target matches 'value' in every zone of the account (or in
+              'domain'). Only A, AAAA and CNAME records are searched, unless
+              'type' gives another one. Zones are processed concurrently by
+              'workers', each one is refreshed once, and the diff covers all
+              of them. 'fetch=export' keeps it to a single read per zone
+            - 'apply' executes the changeset stored in 'plan'. The record ids
+              of the zone are listed first, and the records the plan updates
+              or deletes are read again; when the ids still match the ones the
+              plan was computed against and those records are unchanged, the
+              planned changes are made without reading any other record,
+              otherwise the plan is computed again from its 'records' and
+              'replanned' is returned
+    plan:
+        required: false
+        description:
+            - With 'records', path of a plan file to write instead of making
+              any change. It holds the creates, updates and deletes needed by
+              the zone, and is stamped with the record ids they were computed
+              against
+            - With 'apply', the plan file to execute
+    clear_reverse:
+        required: false
+        default: false
+        description:
+            - With 'decommission', also delete the reverse of the addresses
+              of the deleted A and AAAA records, as ovh_reverse state=absent
+              does. Needs API rights on /ip/*
+    fetch:
+        required: false
+        default: records
+        choices: ['records', 'export']
+        description:
+            - How current records are read. 'records' lists the record ids and
+              GETs each of them, 'export' reads the whole zone in a single
+              request through the zone export
+            - With 'export', record ids are only looked up for the records
+              that are actually modified or deleted
+            - The export holds SPF and DKIM records as TXT; they are read by
+              id, as is the whole zone when the export has a line the parser
+              does not know
+    refresh:
+        required: false
+        default: immediate
+        choices: ['immediate', 'deferred']
+        description:
+            - When the zone is refreshed after a change. 'deferred' only
+              queues the zone in 'refresh_queue'; the ovh_dns_refresh module
+              then refreshes every queued zone once, typically from a handler
+    refresh_queue:
+        required: false
+        default: ~/.ansible/tmp/ovh_dns_refresh_queue
+        description:
+            - File listing the zones waiting for a deferred refresh, on the
+              host running the module
+    zone_check:
+        required: false
+        default: zone
+        choices: ['zone', 'list']
+        description:
+            - How the existence of the zone is checked. 'zone' only queries
+              the zone itself, 'list' looks for it in the list of all zones of
+              the account (kept in the cache when 'cache' is enabled)
+    cache:
+        required: false
+        default: false
+        description:
+            - Keep record details in a local SQLite file, so that only the
+              records never seen before are fetched. OVH record ids are
+              stable, and records modified by this module are kept up to date
+            - Each run diffs the listed record ids against the previous
+              listing; ids which are gone are dropped from the cache, so the
+              cost of a run follows the churn of the zone, not its size. The
+              result holds a 'sync' entry with the listed, added, removed,
+              expired and fetched counts
+    cache_path:
+        required: false
+        default: ~/.ansible/tmp/ovh_dns_cache.sqlite
+        description:
+            - Location of the cache, on the host running the module
+    cache_max_age:
+        required: false
+        default: 86400
+        description:
+            - Age in seconds after which a cached record is fetched again, to
+              catch up with changes made outside of this module; 0 never
+              expires records
+    workers:
+        required: false
+        default: 1
+        description:
+            - Number of concurrent requests used to fetch record details
+            - Raise it on large zones, where fetching records one by one dominates the run time
+            - With 'decommission', 'zones' or 'zones_regex', number of zones
+              processed concurrently; API requests in flight stay bounded by it
+            - Concurrency is reduced automatically while the API throttles requests
+    api_retries:
+        required: false
+        default: 5
+        description:
+            - Number of times a call throttled by the OVH API (HTTP 429, or
+              503 for reads and idempotent writes) is retried, with a
+              jittered exponential backoff or the delay the API asks for
+    profile:
+        required: false
+        default: false
+        description:
+            - Add a 'timings' section to the result, with the count, total,
+              p50 and p95 duration in seconds of the API calls per method and
+              endpoint, and the time spent in the 'fetch', 'match' and 'diff'
+              phases of the module
+'''
+
+EXAMPLES = '''
+# Create a typical A record
+- ovh_dns: state=present domain=mydomain.com name=db1 value=10.10.10.10
+
+# Create a CNAME record
+- ovh_dns: state=present domain=mydomain.com name=dbprod type=cname value=db1
+
+# Delete an existing record, must specify all parameters
+- ovh_dns: state=absent domain=mydomain.com name=dbprod type=cname value=db1
+
+# Delete all TXT records matching '^_acme-challenge.*$' regex
+- ovh_dns: state=absent domain=mydomain.com name='' type=TXT removes='^_acme-challenge.*'
+
+# Same, fetching the records of a large zone with 16 concurrent requests
+- ovh_dns: state=absent domain=mydomain.com name='' type=TXT removes='^_acme-challenge.*' workers=16
+
+# Manage several records with a single zone read and refresh
+- ovh_dns:
+    domain: mydomain.com
+    records:
+      - { name: db1, type: A, value: 10.10.10.10 }
+      - { name: db2, type: A, value: 10.10.10.11, ttl: 600 }
+      - { name: www, type: CNAME, value: web1 }
+      - { name: old, type: CNAME, state: absent }
+
+# Queue the zone refresh, and refresh every changed zone once at the end of the play
+- ovh_dns: state=present domain=mydomain.com name=db1 type=A value=10.10.10.10 refresh=deferred
+  notify: refresh ovh zones
+
+# Only fetch the records not already in the local cache
+- ovh_dns: state=present domain=mydomain.com name=db1 type=A value=10.10.10.10 cache=true
+
+# Check a record against a single zone export instead of one request per record
+- ovh_dns: state=present domain=mydomain.com name=db1 type=A value=10.10.10.10 fetch=export
+
+# Remove every record pointing to a server being decommissioned, in all zones,
+# along with the reverse of its address
+- ovh_dns: state=decommission value=10.10.10.10 fetch=export workers=8 clear_reverse=true
+
+# Clean up the ACME challenges left in every zone of the account, 8 zones at a time
+- ovh_dns: state=absent zones_regex='.*' name='' type=TXT removes='^_acme-challenge.*' workers=8 fetch=export
+
+# Review the changes of a release, then make them without reading the zone again
+- ovh_dns:
+    domain: mydomain.com
+    plan: /var/tmp/mydomain.com.plan
+    records:
+      - { name: db1, type: A, value: 10.10.10.12 }
+      - { name: old, type: CNAME, state: absent }
+- ovh_dns: state=apply domain=mydomain.com plan=/var/tmp/mydomain.com.plan
+
+# Report where the time of a task goes
+- ovh_dns: state=present domain=mydomain.com name=db1 type=A value=10.10.10.10 profile=true
+  register: result
+- debug: var=result.timings
+'''
+
+
+import os
+import sys
+import re
+import ipaddress
+import fcntl
+import hashlib
+import yaml
+from multiprocessing.pool import ThreadPool
+
+try:
+    import ovh
+except ImportError:
+    print("failed=True msg='ovh required for this module'")
+    sys.exit(1)
+
+from ansible.module_utils.ovh_api import InProcessModule, ModuleExit, Profiler, get_client
+from ansible.module_utils.ovh_dns_records import (
+    RECORD_TYPES, RecordCache, list_zones, list_record_ids, get_domain_records,
+    get_record_details, get_domain_records_export, lookup_record_ids, resolve_record_ids)
+
+
+# Types searched by state=decommission unless 'type' is given
+DECOMMISSION_TYPES = ['A', 'AAAA', 'CNAME']
+
+# Pairs of unrelated targets of the same kind: a decommission pattern
+# matching both targets of a pair matches a whole class of targets
+CATCH_ALL_PROBES = [
+    ('192.0.2.1', '198.51.100.254'),
+    ('2001:db8::1', 'fd00:abcd::fe'),
+    ('catch-all.example.invalid.', 'other-host.test.'),
+]
+
+
+# TODO: Try to automate this in case the supplied credentials are not valid
+def get_credentials():
+    """This function is used to obtain an authentication token.
+    It should only be called once."""
+    client = ovh.Client()
+    access_rules = [
+        {'method': 'GET', 'path': '/domain/*'},
+        {'method': 'PUT', 'path': '/domain/*'},
+        {'method': 'POST', 'path': '/domain/*'},
+        {'method': 'DELETE', 'path': '/domain/*'},
+    ]
+    validation = client.request_consumerkey(access_rules)
+    # print("Your consumer key is {}".format(validation['consumerKey']))
+    # print("Please visit {} to validate".format(validation['validationUrl']))
+    return validation['consumerKey']
+
+
+
+def zone_exists(client, domain, check='zone', cache=None):
+    """Check that a zone is managed by the account, either by querying the
+    zone alone or by looking it up in the (cached) list of zones"""
+    if check == 'zone':
+        try:
+            client.get('/domain/zone/{}'.format(domain))
+        except ovh.exceptions.ResourceNotFoundError:
+            return False
+        return True
+
+    zones = cache.get_zones() if cache is not None else None
+    if zones is None or domain not in zones:
+        zones = client.get('/domain/zone')
+        if cache is not None:
+            cache.put_zones(zones)
+    return domain in zones
+
+
+
+def queue_refresh(path, domain):
+    """Add a zone to the queue of zones waiting for a refresh"""
+    path = os.path.expanduser(path)
+    if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'a') as queue:
+        fcntl.flock(queue, fcntl.LOCK_EX)
+        queue.write(domain + '\n')
+
+
+def refresh_zone(client, domain, refresh='immediate', queue=None):
+    """Refresh a zone now, or queue it for ovh_dns_refresh"""
+    if refresh == 'deferred':
+        queue_refresh(queue, domain)
+    else:
+        client.post('/domain/zone/{}/refresh'.format(domain))
+
+
+
+def compute_changeset(records, desired):
+    """Compare the current records of a zone against a list of desired
+    records. Return the records to create, the new values of the records
+    to update in place and the records to delete"""
+    create = []
+    update = {}
+    delete = {}
+
+    wanted = {}
+    for entry in desired:
+        wanted.setdefault((entry['name'], entry['type']), []).append(entry)
+
+    for (name, fieldtype), entries in wanted.items():
+        current = dict((id, records[id]) for id in records
+                       if records[id]['subDomain'] == name
+                       and records[id]['fieldType'] == fieldtype)
+        # Listed values are the only ones allowed once an item is 'present'
+        exclusive = any(entry['state'] == 'present' for entry in entries)
+
+        keep = set()
+        added = []
+        for entry in entries:
+            if entry['state'] == 'absent':
+                continue
+            for id in current:
+                if id not in keep and \
+                        current[id]['target'].lower() == entry['value'].lower() and \
+                        current[id]['ttl'] == entry['ttl']:
+                    keep.add(id)
+                    break
+            else:
+                added.append(dict(
+                    fieldType=fieldtype,
+                    subDomain=name,
+                    target=entry['value'],
+                    ttl=entry['ttl']
+                    ))
+
+        removed = []
+        for id in current:
+            if id in keep:
+                continue
+            if exclusive or any(entry['state'] == 'absent' and
+                                (entry['value'] is None or
+                                 current[id]['target'].lower() == entry['value'].lower())
+                                for entry in entries):
+                removed.append(id)
+
+        # Records of the same name and type are rewritten rather than
+        # deleted and created again
+        while added and removed:
+            update[removed.pop(0)] = added.pop(0)
+        create.extend(added)
+        for id in removed:
+            delete[id] = current[id]
+
+    return create, update, delete
+
+
+def changeset_diff(domain, current, create, update, delete):
+    """Return the records removed and added by a changeset, for the diff"""
+    before_records = [dict(
+        domain=domain,
+        fieldType=current[id]['fieldType'],
+        subDomain=current[id]['subDomain'],
+        target=current[id]['target'],
+        ttl=current[id]['ttl'],
+        ) for id in list(update) + list(delete)]
+    after_records = [dict(newrecord, domain=domain)
+                     for newrecord in list(update.values()) + create]
+    return before_records, after_records
+
+
+def id_stamp(record_ids):
+    """Fingerprint of a set of record ids"""
+    return hashlib.sha256(','.join(str(id) for id in sorted(record_ids)).encode('utf-8')).hexdigest()
+
+
+def changed_since_plan(client, domain, current, workers=1):
+    """Whether any record a plan updates or deletes was modified or deleted
+    since the plan was made; only those records are read again"""
+    try:
+        records = get_record_details(client, domain, list(current), workers)
+    except ovh.exceptions.ResourceNotFoundError:
+        return True
+    return any(records[id][field] != current[id][field]
+               for id in current for field in ('subDomain', 'fieldType', 'target', 'ttl'))
+
+
+def write_plan(path, plan):
+    """Write a plan file, replacing any previous one at once"""
+    path = os.path.expanduser(path)
+    if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path + '.tmp', 'w') as f:
+        yaml.safe_dump(plan, f, default_flow_style=False)
+    os.rename(path + '.tmp', path)
+
+
+def read_plan(path):
+    with open(os.path.expanduser(path)) as f:
+        plan = yaml.safe_load(f)
+    if not isinstance(plan, dict) or 'stamp' not in plan:
+        raise ValueError('not an ovh_dns plan')
+    return plan
+
+
+def update_record(client, domain, id, newrecord):
+    """Update a record in place; its type cannot be changed"""
+    client.put('/domain/zone/{}/record/{}'.format(domain, id),
+               subDomain=newrecord['subDomain'],
+               target=newrecord['target'],
+               ttl=newrecord['ttl'])
+    return dict(newrecord, id=id, zone=domain)
+
+
+def apply_changeset(client, domain, create, update, delete, cache=None):
+    """Update, delete then create records, without refreshing the zone"""
+    response = []
+    for id in update:
+        info = update_record(client, domain, id, update[id])
+        if cache is not None:
+            cache.put(domain, {id: info})
+    if update:
+        response.append({'update': update})
+    for id in delete:
+        client.delete('/domain/zone/{}/record/{}'.format(domain, id))
+    if delete:
+        response.append({'delete': delete})
+        if cache is not None:
+            cache.remove(domain, list(delete))
+    for newrecord in create:
+        res = client.post('/domain/zone/{}/record'.format(domain), **newrecord)
+        response.append(res)
+        if cache is not None and res:
+            cache.put(domain, {res['id']: res})
+    return response
+
+
+def add_sync_stats(total, stats):
+    """Add the cache sync counts of a zone to the ones of the task"""
+    for key in stats:
+        total[key] = total.get(key, 0) + stats[key]
+
+
+def decommission_zone(client, domain, pattern, fieldtypes=DECOMMISSION_TYPES, fetch='records',
+                      cache_path=None, cache_max_age=0, check_mode=False, refresh='immediate',
+                      refresh_queue=None, workers=1, sync_stats=None):
+    """Delete the records of a zone of one of 'fieldtypes' whose target
+    matches 'pattern', then refresh the zone once. Return the deleted
+    records, keyed by id. Safe to run for several zones at once, each call
+    opens its own cache, whose sync counts are added to 'sync_stats'"""
+    cache = RecordCache(cache_path, cache_max_age) if cache_path else None
+    try:
+        if fetch == 'export':
+            fieldtype = fieldtypes[0] if len(fieldtypes) == 1 else None
+            records = get_domain_records_export(client, domain, fieldtype, workers=workers)
+        else:
+            # Only list and read the records of the searched types
+            records = {}
+            for fieldtype in fieldtypes:
+                records.update(get_domain_records(client, domain, fieldtype, workers=workers, cache=cache))
+        records = dict((id, records[id]) for id in records
+                       if records[id]['fieldType'] in fieldtypes and pattern.match(records[id]['target']))
+
+        if records and not check_mode:
+            records = resolve_record_ids(client, domain, records, workers)
+            for id in records:
+                client.delete('/domain/zone/{}/record/{}'.format(domain, id))
+            if cache is not None:
+                cache.remove(domain, list(records))
+            refresh_zone(client, domain, refresh, refresh_queue)
+        return records
+    finally:
+        if cache is not None:
+            if sync_stats is not None:
+                add_sync_stats(sync_stats, cache.sync_stats)
+            cache.close()
+
+
+def is_catch_all(pattern):
+    """Whether a decommission pattern matches a whole class of targets
+    rather than the ones of a server: it matches an empty target, or two
+    unrelated addresses or host names"""
+    if pattern.match(''):
+        return True
+    return any(all(pattern.match(target) for target in pair) for pair in CATCH_ALL_PROBES)
+
+
+def clear_reverse(client, ip, check_mode=False):
+    """Delete the reverse of an address, if any; return whether it had one"""
+    address = ipaddress.ip_address(u'{}'.format(ip))
+    block = '{}%2F{}'.format(address.compressed, address.max_prefixlen)
+    reverses = client.get('/ip/{}/reverse'.format(block))
+    if not reverses:
+        return False
+    if not check_mode:
+        client.delete('/ip/{}/reverse/{}'.format(block, reverses[0]))
+    return True
+
+
+def count_type(records, fieldtype=['A', 'AAAA']):
+    i = 0
+    for id in records:
+        if records[id]['fieldType'] in fieldtype:
+            i+=1
+    return i
+
+
+ARGUMENT_SPEC = dict(
+    domain=dict(default=None),
+    name=dict(default=None),
+    records=dict(default=None, type='list', elements='dict', options=dict(
+        name=dict(required=True),
+        type=dict(required=True, choices=RECORD_TYPES),
+        value=dict(default=None),
+        ttl=dict(default=None, type='int'),
+        state=dict(default=None, choices=['present', 'absent', 'append']),
+    )),
+    state=dict(default='present', choices=['present', 'absent', 'append', 'decommission', 'apply']),
+    type=dict(default=None, choices=RECORD_TYPES),
+    removes=dict(default=None),
+    replace=dict(default=None),
+    value=dict(default=None),
+    create=dict(default=False, type='bool'),
+    ttl=dict(default=3600, type='int'),
+    fetch=dict(default='records', choices=['records', 'export']),
+    refresh=dict(default='immediate', choices=['immediate', 'deferred']),
+    refresh_queue=dict(default='~/.ansible/tmp/ovh_dns_refresh_queue', type='path'),
+    zone_check=dict(default='zone', choices=['zone', 'list']),
+    cache=dict(default=False, type='bool'),
+    cache_path=dict(default='~/.ansible/tmp/ovh_dns_cache.sqlite', type='path'),
+    cache_max_age=dict(default=86400, type='int'),
+    workers=dict(default=1, type='int'),
+    api_retries=dict(default=5, type='int'),
+    profile=dict(default=False, type='bool'),
+    clear_reverse=dict(default=False, type='bool'),
+    plan=dict(default=None, type='path'),
+    zones=dict(default=None, type='list', elements='str'),
+    zones_regex=dict(default=None),
+)
+MUTUALLY_EXCLUSIVE = [['name', 'records'], ['domain', 'zones', 'zones_regex']]
+REQUIRED_IF = [
+    ['state', 'present', ['domain', 'zones', 'zones_regex'], True],
+    ['state', 'absent', ['domain', 'zones', 'zones_regex'], True],
+    ['state', 'append', ['domain', 'zones', 'zones_regex'], True],
+    ['state', 'present', ['name', 'records'], True],
+    ['state', 'absent', ['name', 'records'], True],
+    ['state', 'append', ['name', 'records'], True],
+    ['state', 'decommission', ['value']],
+    ['state', 'apply', ['domain', 'plan']],
+]
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=ARGUMENT_SPEC,
+        required_if=REQUIRED_IF,
+        mutually_exclusive=MUTUALLY_EXCLUSIVE,
+        supports_check_mode=True
+    )
+    run_module(module, get_client(module))
+
+
+def run_zones(module, client, zones):
+    """Run the module logic on each zone, 'workers' zones at a time, all of
+    them sharing the client and its rate limiting; return the results of
+    each zone"""
+    def run(zone):
+        params = dict(module.params, domain=zone, zones=None, zones_regex=None, profile=False)
+        if params['records'] is not None:
+            # Items get their defaults filled in by each run
+            params['records'] = [dict(entry) for entry in params['records']]
+        try:
+            run_module(InProcessModule(params, module.check_mode), client)
+        except ModuleExit as e:
+            results = e.results
+        except (ovh.exceptions.APIError, ValueError) as e:
+            results = dict(changed=False, failed=True, msg=str(e))
+        # Calls are counted once, by the stats of the whole task
+        results.pop('api_stats', None)
+        return zone, results
+
+    pool = ThreadPool(max(1, min(module.params.get('workers'), len(zones))))
+    try:
+        return dict(pool.map(run, zones))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_module(module, client):
+    """Reconcile the zone as requested by the module parameters; always ends
+    with module.exit_json() or module.fail_json()"""
+    cache = None
+    if module.params.get('cache'):
+        cache = RecordCache(module.params.get('cache_path'),
+                            module.params.get('cache_max_age'))
+    try:
+        reconcile(module, client, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def reconcile(module, client, cache):
+    """Body of run_module(), with the cache it opened if any"""
+    results = dict(
+        changed=False,
+        msg='',
+        records='',
+        response='',
+        original_message=module.params['name'],
+        diff={}
+    )
+    response = []
+
+    # Get parameters
+    domain = module.params.get('domain')
+    name = module.params.get('name')
+    state = module.params.get('state')
+    fieldtype = module.params.get('type')
+    targetval = module.params.get('value')
+    removes = module.params.get('removes')
+    ttlval = module.params.get('ttl')
+    oldtargetval = module.params.get('replace')
+    create = module.params.get('create')
+    fetch = module.params.get('fetch')
+    workers = module.params.get('workers')
+    desired = module.params.get('records')
+    refresh = module.params.get('refresh')
+    refresh_queue = module.params.get('refresh_queue')
+    plan = module.params.get('plan')
+    profiler = Profiler()
+    client = profiler.wrap(client)
+    profiler.attach(module, module.params.get('profile'))
+    if cache is not None:
+        profiler.extra['sync'] = cache.sync_stats
+
+    # Run the same task on several zones
+    zones = module.params.get('zones')
+    zones_regex = module.params.get('zones_regex')
+    if zones is not None or zones_regex is not None:
+        if state not in ('present', 'absent', 'append'):
+            module.fail_json(msg='zones and zones_regex are only supported with present, absent and append')
+        if plan is not None:
+            module.fail_json(msg='plan is only supported with a single domain')
+        if zones_regex is not None:
+            try:
+                pattern = re.compile('(?:{})$'.format(zones_regex), re.IGNORECASE)
+            except re.error as e:
+                module.fail_json(msg='Invalid zones regex {}: {}'.format(zones_regex, e))
+            try:
+                zones = [zone for zone in list_zones(client, cache) if pattern.match(zone)]
+            except ovh.exceptions.APIError as e:
+                module.fail_json(msg='Cannot list the zones of the account: {}'.format(e))
+        if cache is not None:
+            # Each zone opens the cache on its own
+            cache.close()
+
+        profiler.start('zones')
+        done = run_zones(module, client, zones)
+        profiler.stop('zones')
+
+        results['zones'] = {}
+        results['diff'] = []
+        failed = []
+        for zone in zones:
+            zone_results = done[zone]
+            # Cache syncs are counted by the stats of the whole task
+            sync = zone_results.pop('sync', None)
+            if sync and cache is not None:
+                add_sync_stats(cache.sync_stats, sync)
+            diff = zone_results.pop('diff', None)
+            if diff and (diff.get('before') or diff.get('after')):
+                results['diff'].append(dict(diff, before_header=zone, after_header=zone))
+            results['zones'][zone] = zone_results
+            if zone_results.get('changed'):
+                results['changed'] = True
+            if zone_results.get('failed'):
+                failed.append(zone)
+        results['msg'] = 'Changed {} zone(s) out of {}'.format(
+            len([zone for zone in zones if done[zone].get('changed')]), len(zones))
+        if failed:
+            results['msg'] += ', failed in {} zone(s): {}'.format(len(failed), ', '.join(failed))
+            module.fail_json(**results)
+        module.exit_json(**results)
+
+    # Execute a plan, unless the zone changed since it was computed
+    if state == 'apply':
+        try:
+            planned = read_plan(plan)
+        except (IOError, OSError, ValueError, yaml.YAMLError) as e:
+            module.fail_json(msg='Cannot read plan {}: {}'.format(plan, e))
+        if planned['domain'] != domain:
+            module.fail_json(msg='Plan {} is for {}, not {}'.format(plan, planned['domain'], domain))
+        results['plan'] = plan
+
+        try:
+            record_ids = list_record_ids(client, domain, planned['fieldType'], planned['subDomain'])
+        except ovh.exceptions.ResourceNotFoundError:
+            module.fail_json(msg='Domain {} does not exist'.format(domain))
+
+        if id_stamp(record_ids) != planned['stamp'] or \
+                changed_since_plan(client, domain, planned['current'], workers):
+            # Plan again against the current records
+            results['replanned'] = True
+            desired = planned['records']
+            plan = None
+        else:
+            create, update, delete = planned['create'], planned['update'], planned['delete']
+            if create or update or delete:
+                if not module.check_mode:
+                    results['response'] = apply_changeset(client, domain, create, update, delete, cache)
+                    refresh_zone(client, domain, refresh, refresh_queue)
+                results['update'] = update
+                results['delete'] = delete
+                before_records, after_records = changeset_diff(domain, planned['current'],
+                                                               create, update, delete)
+                results['diff']['before'] = yaml.dump(before_records) if before_records else ''
+                results['diff']['after'] = yaml.dump(after_records) if after_records else ''
+                results['changed'] = True
+            module.exit_json(**results)
+
+    elif plan is not None and desired is None:
+        module.fail_json(msg='plan is only supported with records')
+
+    # Delete the records pointing to a target in every zone
+    if state == 'decommission':
+        if desired is not None:
+            module.fail_json(msg='records cannot be used with state=decommission')
+        try:
+            pattern = re.compile('(?:{})$'.format(targetval), re.IGNORECASE)
+        except re.error as e:
+            module.fail_json(msg='Invalid value regex {}: {}'.format(targetval, e))
+        if is_catch_all(pattern):
+            module.fail_json(msg='value {} matches a whole class of targets, refusing to '
+                                 'decommission it'.format(targetval))
+        fieldtypes = [fieldtype] if fieldtype else DECOMMISSION_TYPES
+
+        zones = [domain] if domain else list_zones(client, cache)
+
+        def decommission(zone):
+            # Errors are reported per zone, the other zones go on
+            sync = {}
+            try:
+                return zone, decommission_zone(
+                    client, zone, pattern, fieldtypes, fetch,
+                    module.params.get('cache_path') if cache is not None else None,
+                    module.params.get('cache_max_age'), module.check_mode,
+                    refresh, refresh_queue, workers, sync), None, sync
+            except (ovh.exceptions.APIError, ValueError) as e:
+                return zone, {}, str(e), sync
+
+        profiler.start('fetch')
+        pool = ThreadPool(max(1, min(workers, len(zones))))
+        try:
+            done = pool.map(decommission, zones)
+        finally:
+            pool.close()
+            pool.join()
+        profiler.stop('fetch')
+
+        before_records = []
+        addresses = []
+        results['delete'] = {}
+        errors = {}
+        for zone, records, error, sync in done:
+            if cache is not None:
+                add_sync_stats(cache.sync_stats, sync)
+            if error is not None:
+                errors[zone] = error
+            if not records:
+                continue
+            results['delete'][zone] = records
+            for id in records:
+                before_records.append(dict(
+                    domain=zone,
+                    fieldType=records[id]['fieldType'],
+                    subDomain=records[id]['subDomain'],
+                    target=records[id]['target'],
+                    ttl=records[id]['ttl'],
+                    ))
+                if records[id]['fieldType'] in ('A', 'AAAA') and \
+                        records[id]['target'] not in addresses:
+                    addresses.append(records[id]['target'])
+
+        if module.params.get('clear_reverse'):
+            results['reverse'] = {}
+            for ip in addresses:
+                try:
+                    if clear_reverse(client, ip, module.check_mode):
+                        results['reverse'][ip] = 'deleted'
+                        results['changed'] = True
+                    else:
+                        results['reverse'][ip] = 'absent'
+                except (ovh.exceptions.APIError, ValueError) as e:
+                    results['reverse'][ip] = 'not manageable: {}'.format(e)
+
+        if before_records:
+            results['changed'] = True
+            profiler.start('diff')
+            results['diff']['before'] = yaml.dump(before_records)
+            results['diff']['after'] = ''
+            profiler.stop('diff')
+        results['msg'] = 'Deleted {} record(s) in {} zone(s)'.format(
+            len(before_records), len(results['delete']))
+        if errors:
+            results['errors'] = errors
+            results['msg'] += ', failed in {} zone(s)'.format(len(errors))
+            module.fail_json(**results)
+        module.exit_json(**results)
+
+    # Check that the domain exists
+    if not zone_exists(client, domain, module.params.get('zone_check'), cache):
+        module.fail_json(msg='Domain {} does not exist'.format(domain))
+
+    # Reconcile a list of records at once
+    if desired is not None:
+        for entry in desired:
+            if entry['state'] is None:
+                entry['state'] = state
+            if entry['ttl'] is None:
+                entry['ttl'] = ttlval
+            if entry['state'] != 'absent' and entry['value'] is None:
+                module.fail_json(msg='Did not specify a value for {} record {}'.format(
+                    entry['type'], entry['name']))
+
+        # Only narrow the read when every item shares the same name or type
+        names = set(entry['name'] for entry in desired)
+        types = set(entry['type'] for entry in desired)
+        subdomain = names.pop() if len(names) == 1 else None
+        fieldtype = types.pop() if len(types) == 1 else None
+        profiler.start('fetch')
+        if fetch == 'export':
+            records = get_domain_records_export(client, domain, fieldtype, subdomain, workers)
+        else:
+            records = get_domain_records(client, domain, fieldtype, subdomain, workers, cache)
+        profiler.stop('fetch')
+
+        profiler.start('match')
+        create, update, delete = compute_changeset(records, desired)
+        current = dict((id, records[id]) for id in list(update) + list(delete))
+        profiler.stop('match')
+        if (create or update or delete or plan is not None) and not module.check_mode:
+            try:
+                ids = lookup_record_ids(client, domain, current, workers)
+            except ValueError as e:
+                module.fail_json(msg=str(e))
+            current = dict((ids[id], dict(current[id], id=ids[id])) for id in current)
+            update = dict((ids[id], update[id]) for id in update)
+            delete = dict((ids[id], dict(current[ids[id]])) for id in delete)
+
+        if plan is not None:
+            # Stamp the plan with the ids it was computed against
+            if not module.check_mode:
+                if fetch == 'export':
+                    record_ids = list_record_ids(client, domain, fieldtype, subdomain)
+                else:
+                    record_ids = list(records)
+                write_plan(plan, dict(domain=domain, subDomain=subdomain, fieldType=fieldtype,
+                                      stamp=id_stamp(record_ids), records=desired, create=create,
+                                      update=update, delete=delete, current=current))
+            results['plan'] = plan
+        elif (create or update or delete) and not module.check_mode:
+            response = apply_changeset(client, domain, create, update, delete, cache)
+            refresh_zone(client, domain, refresh, refresh_queue)
+            results['response'] = response
+
+        if create or update or delete:
+            results['update'] = update
+            results['delete'] = delete
+            profiler.start('diff')
+            before_records, after_records = changeset_diff(domain, current, create, update, delete)
+            results['diff']['before'] = yaml.dump(before_records) if before_records else ''
+            results['diff']['after'] = yaml.dump(after_records) if after_records else ''
+            profiler.stop('diff')
+            results['changed'] = True
+        module.exit_json(**results)
+
+    # Obtain all domain records to check status against what is demanded
+    profiler.start('fetch')
+    if fetch == 'export':
+        records = get_domain_records_export(client, domain, fieldtype, name, workers)
+    else:
+        records = get_domain_records(client, domain, fieldtype, name, workers, cache)
+    profiler.stop('fetch')
+
+    # Remove a record(s)
+    if state == 'absent':
+
+        if len(name) == 0 and not removes:
+            module.fail_json(msg='wildcard delete not allowed')
+
+        if not records:
+            module.exit_json(changed=False)
+
+        # Delete same target
+        profiler.start('match')
+        rn = None
+        rv = None
+        if removes:
+            rn = re.compile(removes, re.IGNORECASE)
+        else:
+            rn = re.compile("^{}$".format(name), re.IGNORECASE)
+        if targetval:
+            rv = re.compile(targetval, re.IGNORECASE)
+        else:
+            rv = re.compile(r'.*')
+
+        tmprecords = records.copy()
+        for id in records:
+            if not rn.match(records[id]['subDomain']) or not rv.match(records[id]['target']):
+                tmprecords.pop(id)
+        records = tmprecords
+        profiler.stop('match')
+
+        if records and not module.check_mode:
+            try:
+                records = resolve_record_ids(client, domain, records, workers)
+            except ValueError as e:
+                module.fail_json(msg=str(e))
+
+        results['delete'] = records
+        if records:
+            before_records=[]
+            # Remove the ALL record
+            for id in records:
+                before_records.append(dict(
+                    domain=domain,
+                    fieldType=records[id]['fieldType'],
+                    subDomain=records[id]['subDomain'],
+                    target=records[id]['target'],
+                    ttl=records[id]['ttl'],
+                    ))
+                if not module.check_mode:
+                    client.delete('/domain/zone/{}/record/{}'.format(domain, id))
+            if not module.check_mode:
+                if cache is not None:
+                    cache.remove(domain, list(records))
+                refresh_zone(client, domain, refresh, refresh_queue)
+            results['changed'] = True
+            profiler.start('diff')
+            results['diff']['before'] = yaml.dump(before_records)
+            results['diff']['after'] = ''
+            profiler.stop('diff')
+        module.exit_json(**results)
+
+    # Add / modify a record
+    elif state in ['present', 'append']:
+
+        # Since we are inserting a record, we need a target
+        if targetval is None:
+            module.fail_json(msg='Did not specify a value')
+        if fieldtype is None:
+            module.fail_json(msg='Did not specify a type')
+
+        # Does the record exist already? Yes
+        if records:
+            profiler.start('match')
+            for id in records:
+                if records[id]['target'].lower() == targetval.lower() and records[id]['ttl'] == ttlval:
+                    # The record is already as requested, no need to change anything
+                    module.exit_json(changed=False)
+
+            # list records modify in end
+            oldrecords = {}
+            if state == 'present':
+                if oldtargetval:
+                    r = re.compile(oldtargetval, re.IGNORECASE)
+                for id in records:
+                    # update target
+                    if oldtargetval:
+                        if re.match(r, records[id]['target']):
+                            oldrecords.update({id: records[id]})
+                    # uniq update
+                    else:
+                        oldrecords.update({id: records[id]})
+                if oldtargetval and not oldrecords and not create:
+                    module.fail_json(msg='Old record not match, use append ?')
+            profiler.stop('match')
+
+            if oldrecords and not module.check_mode:
+                try:
+                    oldrecords = resolve_record_ids(client, domain, oldrecords, workers)
+                except ValueError as e:
+                    module.fail_json(msg=str(e))
+
+            if oldrecords:
+                before_records = []
+                # FIXME: check if all records as same fieldType not A/AAAA and CNAME
+                # if fieldtype in ['A', 'AAAA', 'CNAME']:
+                #     oldA = count_type(records)
+                #     oldC = count_type(records, 'CNAME')
+                #     newA = count_type(oldrecords)
+                #     newC = count_type(oldrecords, 'CNAME')
+                #     check = True
+                #     if oldA > 0 and newC > 0 and oldA != newC:
+                #         check = False
+                #     if oldC > 0 and newA > 0 and oldC != newA:
+                #         check = False
+                #     if not check:
+                #         module.fail_json(msg='The subdomain already uses a DNS record.  You can not register a {} field because of an incompatibility.'.format(fieldType))
+
+                # Update one record of the same type in place, delete the
+                # other ones; re-create the record when the type changes
+                newrecord = dict(
+                        fieldType=fieldtype,
+                        subDomain=name,
+                        target=targetval,
+                        ttl=ttlval
+                        )
+                updated = None
+                for id in oldrecords:
+                    before_records.append(dict(
+                        domain=domain,
+                        fieldType=oldrecords[id]['fieldType'],
+                        subDomain=oldrecords[id]['subDomain'],
+                        target=oldrecords[id]['target'],
+                        ttl=oldrecords[id]['ttl'],
+                        ))
+                    if updated is None and oldrecords[id]['fieldType'] == fieldtype:
+                        updated = id
+                if not module.check_mode:
+                    if updated is not None:
+                        info = update_record(client, domain, updated, newrecord)
+                        response.append({'update': {updated: dict(newrecord)}})
+                        if cache is not None:
+                            cache.put(domain, {updated: info})
+                    deleted = dict((id, oldrecords[id]) for id in oldrecords if id != updated)
+                    for id in deleted:
+                        client.delete('/domain/zone/{}/record/{}'.format(domain, id))
+                    if deleted:
+                        response.append({'delete': deleted})
+                        if cache is not None:
+                            cache.remove(domain, list(deleted))
+
+                    if updated is None:
+                        res = client.post('/domain/zone/{}/record'.format(domain), **newrecord)
+                        response.append(res)
+                        if cache is not None and res:
+                            cache.put(domain, {res['id']: res})
+                    # Refresh the zone and exit
+                    refresh_zone(client, domain, refresh, refresh_queue)
+                    results['response'] = response
+                profiler.start('diff')
+                results['diff']['before'] = yaml.dump(before_records)
+                after = [newrecord]
+                after[0]['domain'] = domain
+                results['diff']['after'] = yaml.dump(after)
+                profiler.stop('diff')
+                results['changed'] = True
+                module.exit_json(**results)
+        # end records exist
+
+        # Add record
+        if state == 'append' or not records:
+            newrecord = dict(
+                    fieldType=fieldtype,
+                    subDomain=name,
+                    target=targetval,
+                    ttl=ttlval
+                    )
+            if not module.check_mode:
+                # Add the record
+                res = client.post('/domain/zone/{}/record'.format(domain), **newrecord)
+                response.append(res)
+                if cache is not None and res:
+                    cache.put(domain, {res['id']: res})
+                refresh_zone(client, domain, refresh, refresh_queue)
+            profiler.start('diff')
+            results['diff']['before'] = ''
+            after = dict(newrecord)
+            after['domain'] = domain
+            results['diff']['after'] = yaml.dump(after)
+            profiler.stop('diff')
+            results['changed'] = True
+
+        results['response'] = response
+        module.exit_json(**results)
+        # end state == 'present'
+
+    # We should never reach here
+    results['msg'] = 'Internal ovh_dns module error'
+    module.fail_json(**results)
+
+
+# import module snippets
+from ansible.module_utils.basic import *
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns_info, an Ansible module for reading OVH DNS records
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import print_function
+
+DOCUMENTATION = '''
+---
+module: ovh_dns_info
+author: Carlos Izquierdo
+short_description: Read OVH DNS records
+description:
+    - Read the records of an OVH DNS zone, optionally narrowed to a name
+      and/or a type, without changing anything
+    - The name and type filters are applied by the API, like ovh_dns does
+requirements: [ "ovh" ]
+options:
+    domain:
+        required: true
+        description:
+            - Name of the domain zone
+    name:
+        required: false
+        description:
+            - Only return the records of this subdomain ('' for the apex
+              records is not a filter, all records are returned)
+    type:
+        required: false
+        choices: ['A', 'AAAA', 'CAA', 'CNAME', 'DKIM', 'LOC', 'MX', 'NAPTR', 'NS', 'PTR', 'SPF', 'SRV', 'SSHFP', 'TLSA', 'TXT']
+        description:
+            - Only return the records of this type
+    fetch:
+        required: false
+        default: records
+        choices: ['records', 'export']
+        description:
+            - How records are read. 'records' lists the record ids and GETs
+              each of them, 'export' reads the whole zone in a single request
+              through the zone export, but does not return record ids
+            - The export holds SPF and DKIM records as TXT; they are read by
+              id, as is the whole zone when the export has a line the parser
+              does not know
+    cache:
+        required: false
+        default: false
+        description:
+            - Serve record details from the SQLite cache shared with ovh_dns,
+              fetching only the records never seen before (or expired)
+    cache_path:
+        required: false
+        default: ~/.ansible/tmp/ovh_dns_cache.sqlite
+        description:
+            - Location of the cache, on the host running the module
+    cache_max_age:
+        required: false
+        default: 86400
+        description:
+            - Age in seconds after which a cached record is fetched again; 0
+              never expires records
+    workers:
+        required: false
+        default: 1
+        description:
+            - Number of concurrent requests used to fetch record details
+            - Concurrency is reduced automatically while the API throttles requests
+    api_retries:
+        required: false
+        default: 5
+        description:
+            - Number of times a call throttled by the OVH API (HTTP 429, or
+              503 for reads) is retried, with a jittered exponential backoff or
+              the delay the API asks for
+    profile:
+        required: false
+        default: false
+        description:
+            - Add a 'timings' section to the result, with the count, total,
+              p50 and p95 duration in seconds of the API calls per method and
+              endpoint, and the time spent fetching the records
+'''
+
+EXAMPLES = '''
+# Read the A records of db1
+- ovh_dns_info: domain=mydomain.com name=db1 type=A
+  register: db1
+
+- debug: msg="db1 points to {{ db1.records | map(attribute='value') | list }}"
+
+# Read a whole large zone with 16 concurrent requests, reusing the cache of ovh_dns
+- ovh_dns_info: domain=mydomain.com workers=16 cache=true
+  register: zone
+
+# Read a whole zone in a single request
+- ovh_dns_info: domain=mydomain.com fetch=export
+'''
+
+
+import sys
+
+try:
+    import ovh
+except ImportError:
+    print("failed=True msg='ovh required for this module'")
+    sys.exit(1)
+
+from ansible.module_utils.ovh_api import Profiler, get_client
+from ansible.module_utils.ovh_dns_records import (
+    RECORD_TYPES, RecordCache, get_domain_records, get_domain_records_export)
+
+
+ARGUMENT_SPEC = dict(
+    domain=dict(required=True),
+    name=dict(default=None),
+    type=dict(default=None, choices=RECORD_TYPES),
+    fetch=dict(default='records', choices=['records', 'export']),
+    cache=dict(default=False, type='bool'),
+    cache_path=dict(default='~/.ansible/tmp/ovh_dns_cache.sqlite', type='path'),
+    cache_max_age=dict(default=86400, type='int'),
+    workers=dict(default=1, type='int'),
+    api_retries=dict(default=5, type='int'),
+    profile=dict(default=False, type='bool'),
+)
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=ARGUMENT_SPEC,
+        supports_check_mode=True
+    )
+    run_module(module, get_client(module))
+
+
+def run_module(module, client):
+    """Read the records requested by the module parameters; always ends
+    with module.exit_json() or module.fail_json()"""
+    domain = module.params.get('domain')
+    name = module.params.get('name')
+    fieldtype = module.params.get('type')
+    workers = module.params.get('workers')
+
+    profiler = Profiler()
+    client = profiler.wrap(client)
+    profiler.attach(module, module.params.get('profile'))
+    cache = None
+    if module.params.get('cache'):
+        cache = RecordCache(module.params.get('cache_path'),
+                            module.params.get('cache_max_age'))
+        profiler.extra['sync'] = cache.sync_stats
+
+    profiler.start('fetch')
+    try:
+        if module.params.get('fetch') == 'export':
+            records = get_domain_records_export(client, domain, fieldtype, name, workers)
+        else:
+            records = get_domain_records(client, domain, fieldtype, name, workers, cache)
+    except ovh.exceptions.ResourceNotFoundError:
+        module.fail_json(msg='Domain {} does not exist'.format(domain))
+    profiler.stop('fetch')
+
+    records = sorted((dict(
+        id=record['id'],
+        name=record['subDomain'],
+        type=record['fieldType'],
+        value=record['target'],
+        ttl=record['ttl'],
+        ) for record in records.values()),
+        key=lambda record: (record['name'], record['type'], record['value']))
+    module.exit_json(changed=False, records=records, count=len(records))
+
+
+# import module snippets
+from ansible.module_utils.basic import *
+
+if __name__ == '__main__':
+    main()
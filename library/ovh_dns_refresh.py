@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns_refresh, an Ansible module for refreshing OVH DNS zones
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import print_function
+
+DOCUMENTATION = '''
+---
+module: ovh_dns_refresh
+author: Carlos Izquierdo
+short_description: Refresh OVH DNS zones queued by ovh_dns
+description:
+    - Refresh, once each, the zones queued by ovh_dns with refresh=deferred
+requirements: [ "ovh" ]
+options:
+    zones:
+        required: false
+        description:
+            - Only refresh these zones; other queued zones stay in the queue
+    queue:
+        required: false
+        default: ~/.ansible/tmp/ovh_dns_refresh_queue
+        description:
+            - File listing the zones waiting for a refresh, same as the
+              'refresh_queue' option of ovh_dns
+'''
+
+EXAMPLES = '''
+# Queue refreshes in tasks, and flush them once at the end of the play
+- ovh_dns: state=present domain=mydomain.com name=db1 type=A value=10.10.10.10 refresh=deferred
+  notify: refresh ovh zones
+
+# handlers:
+- name: refresh ovh zones
+  ovh_dns_refresh:
+'''
+
+
+import os
+import sys
+import fcntl
+
+try:
+    import ovh
+except ImportError:
+    print("failed=True msg='ovh required for this module'")
+    sys.exit(1)
+
+from ansible.module_utils.ovh_api import Profiler, get_client
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            zones=dict(default=None, type='list', elements='str'),
+            queue=dict(default='~/.ansible/tmp/ovh_dns_refresh_queue', type='path'),
+        ),
+        supports_check_mode=True
+    )
+    results = dict(
+        changed=False,
+        msg='',
+        refreshed=[],
+    )
+    profiler = Profiler()
+    profiler.attach(module)
+
+    zones = module.params.get('zones')
+    path = os.path.expanduser(module.params.get('queue'))
+
+    if not os.path.exists(path):
+        results['msg'] = 'No zone waiting for a refresh'
+        module.exit_json(**results)
+
+    # Keep the queue locked, so that no zone is queued while it is flushed
+    with open(path, 'r+') as queue:
+        fcntl.flock(queue, fcntl.LOCK_EX)
+        pending = []
+        for line in queue:
+            if line.strip() and line.strip() not in pending:
+                pending.append(line.strip())
+
+        refresh = [zone for zone in pending if zones is None or zone in zones]
+        remaining = [zone for zone in pending if zone not in refresh]
+
+        if refresh and not module.check_mode:
+            client = profiler.wrap(get_client(module))
+            try:
+                for zone in refresh:
+                    client.post('/domain/zone/{}/refresh'.format(zone))
+                    results['refreshed'].append(zone)
+            except ovh.exceptions.APIError as e:
+                # Zones that were not refreshed stay in the queue
+                remaining.extend(zone for zone in refresh
+                                 if zone not in results['refreshed'])
+                queue.seek(0)
+                queue.truncate()
+                queue.write(''.join(zone + '\n' for zone in remaining))
+                results['msg'] = 'Refresh of {} failed: {}'.format(zone, e)
+                module.fail_json(**results)
+
+            queue.seek(0)
+            queue.truncate()
+            queue.write(''.join(zone + '\n' for zone in remaining))
+        elif refresh:
+            results['refreshed'] = refresh
+
+    if refresh:
+        results['changed'] = True
+        results['msg'] = 'Refreshed {} zone(s)'.format(len(refresh))
+    else:
+        results['msg'] = 'No zone waiting for a refresh'
+    module.exit_json(**results)
+
+
+# import module snippets
+from ansible.module_utils.basic import *
+
+main()
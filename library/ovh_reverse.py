@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+
+# ovh_reverse, an Ansible module for managing OVH DNS reverse
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import print_function
+
+DOCUMENTATION = '''
+---
+module: ovh_reverse
+author: Laurent Almeras
+short_description: Manage OVH DNS reverse
+description:
+    - Manage OVH (French European hosting provider) DNS reverse
+requirements: [ "ovh" ]
+options:
+    ip:
+        required: true unless ips is used
+        description:
+            - IP we want to manage, IPv4 or IPv6 (managed as a /32 or /128
+              block)
+    ips:
+        required: false
+        description:
+            - Many IPs to manage in one task, as a mapping of IP to reverse,
+              or a list of IPs or of dicts with ip, reverse and state, which
+              default to the module 'reverse' and 'state'
+            - The current reverses are all read first, then the changes are
+              made, 'workers' IPs at a time. Results are returned per IP in
+              'reverses', with a single diff
+    block:
+        required: false
+        description:
+            - Block (such as 1.2.3.0/24 or 2001:db8::/64) holding the IPs of 'ips'. Their
+              current reverses are then read from a single listing of the
+              block, plus one request per IP which has a reverse, instead of
+              two requests per IP
+            - Without 'ips', the reverses of every IP of the block are
+              returned in 'reverses', and nothing is changed
+    template:
+        required: false
+        description:
+            - With 'block', set the reverse of every address of the block
+              from this template, where {ip} is the address, {dashed} the
+              address with dashes as separators and, for IPv4, {a}, {b}, {c}
+              and {d} its bytes, for instance ip-{a}-{b}-{c}-{d}.mydomain.tld.
+              Blocks are limited to 65536 addresses
+            - The current reverses come from the block listing and only the
+              differences are written, 'workers' at a time; 'reverses' only
+              holds the addresses changed or failed
+    reverse:
+        required: false
+        description:
+            - reverse name to associate the IP with; not used if state: absent.
+              For state: present and reverse is empty, only checks if a reverse
+              exists else triggers a failure
+    state:
+        required: false
+        default: present
+        choices: ['present', 'absent']
+        description:
+            - present or absent: present checks current reverse and update it as
+              needed, absent delete reverse record if present.
+    verify:
+        required: false
+        default: false
+        description:
+            - Read a reverse again after updating it, instead of trusting the
+              answer of the API, which already holds the new reverse
+    workers:
+        required: false
+        default: 8
+        description:
+            - With 'ips', number of concurrent API requests. Concurrency is
+              reduced automatically while the API throttles requests
+    api_retries:
+        required: false
+        default: 5
+        description:
+            - Number of times a call throttled by the OVH API (HTTP 429, or
+              503 for reads and idempotent writes) is retried, with a
+              jittered exponential backoff or the delay the API asks for
+    profile:
+        required: false
+        default: false
+        description:
+            - Add a 'timings' section to the result, with the count, total,
+              p50 and p95 duration in seconds of the API calls per method and
+              endpoint, and the time spent reading the current reverse
+'''
+
+EXAMPLES = '''
+# Create a reverse
+- ovh_reverse: ip=10.10.10.10 state=present reverse=myhost.mydomain.tld.
+
+# Check a reverse exists, else triggers a failure
+- ovh_reverse: ip=10.10.10.10 state=present
+
+# Delete a reverse
+- ovh_reverse: ip=10.10.10.10 state=absent
+
+# List the reverses of a block
+- ovh_reverse: block=10.10.10.0/24
+  register: block
+
+# IPv6 addresses and blocks are supported too
+- ovh_reverse: ip=2001:db8::10 reverse=myhost.mydomain.tld.
+- ovh_reverse: block=2001:db8::/64
+
+# Set the reverse of every address of a block from a template
+- ovh_reverse: block=10.10.10.0/24 template='ip-{a}-{b}-{c}-{d}.mydomain.tld.' workers=16
+
+# Set the reverses of several IPs of a block, reading them from the block listing
+- ovh_reverse:
+    ips:
+      10.10.10.10: db1.mydomain.tld.
+      10.10.10.11: db2.mydomain.tld.
+    block: 10.10.10.0/24
+'''
+
+
+import sys
+import ipaddress
+import yaml
+from multiprocessing.pool import ThreadPool
+
+try:
+    import ovh
+except ImportError:
+    print("failed=True msg='ovh required for this module'")
+    sys.exit(1)
+
+from ansible.module_utils.ovh_api import Profiler, get_client
+
+
+# TODO: Try to automate this in case the supplied credentials are not valid
+def get_credentials():
+    """This function is used to obtain an authentication token.
+    It should only be called once."""
+    client = ovh.Client()
+    access_rules = [
+        {'method': 'GET', 'path': '/domain/*'},
+        {'method': 'PUT', 'path': '/domain/*'},
+        {'method': 'POST', 'path': '/domain/*'},
+        {'method': 'DELETE', 'path': '/domain/*'},
+    ]
+    validation = client.request_consumerkey(access_rules)
+    # print("Your consumer key is {}".format(validation['consumerKey']))
+    # print("Please visit {} to validate".format(validation['validationUrl']))
+    return validation['consumerKey']
+
+
+def parse_ip(ip):
+    """Parse an IPv4 or IPv6 address; raise ValueError when it is not one"""
+    return ipaddress.ip_address(u'{}'.format(ip))
+
+
+def ip_path(address):
+    """Return the URL path of the single address block of an address, such
+    as 1.2.3.4%2F32 or 2001:db8::1%2F128"""
+    return '{}%2F{}'.format(address.compressed, address.max_prefixlen)
+
+
+def get_reverse(client, address):
+    """Obtain a reverse"""
+    # this url works both with /32 (/128) blocks or ip as first parameter
+    # may throw an APIError
+
+    # first check ip management is accessible, throw an ApiError if not
+    ip_reverses = client.get('/ip/{}/reverse'.format(ip_path(address)))
+    if not ip_reverses:
+        # if list if empty, ip is manageable but there is no reverse
+        return None
+    else:
+        # if ip is manageable, get reverse information
+        # result is a list; only one reverse is expected
+        return client.get('/ip/{}/reverse/{}'.format(ip_path(address), ip_reverses[0]))
+
+
+def block_path(network):
+    """Return the URL path of a block, such as 1.2.3.0%2F24"""
+    return '{}%2F{}'.format(network.network_address.compressed, network.prefixlen)
+
+
+def template_reverse(template, address):
+    """Render the reverse of an address from a template, where {ip} is the
+    address, {dashed} the address with dashes as separators and, for IPv4,
+    {a} to {d} its bytes"""
+    fields = dict(ip=address.compressed,
+                  dashed=address.compressed.replace('.', '-').replace(':', '-'))
+    if address.version == 4:
+        fields.update(zip('abcd', address.compressed.split('.')))
+    return template.format(**fields)
+
+
+def get_block_reverses(client, network, ips=None, workers=1):
+    """Obtain the reverses of a whole block with a single listing, and the
+    details of the IPs which have one, restricted to 'ips' when given.
+    Return the reverses keyed by address, None for the IPs without one"""
+    path = block_path(network)
+    # The API may not write addresses, IPv6 ones in particular, like ipaddress
+    listed = dict((parse_ip(ip), ip) for ip in client.get('/ip/{}/reverse'.format(path)))
+    if ips is None:
+        ips = list(listed)
+    reversed_ips = [address for address in ips if address in listed]
+
+    def fetch(address):
+        return address, client.get('/ip/{}/reverse/{}'.format(path, listed[address]))
+
+    pool = ThreadPool(max(1, min(workers, len(reversed_ips))))
+    try:
+        reverses = dict(pool.map(fetch, reversed_ips))
+    finally:
+        pool.close()
+        pool.join()
+    return dict((ip, reverses.get(ip)) for ip in ips)
+
+
+def exc_str(ovh_exception):
+    """__str__ is overloaded in ovh APIError and does not provide any insight.
+    Alternative implementation to retrieve first exception parameter.
+    """
+    args = getattr(ovh_exception, 'args', None)
+    if args:
+        return args[0]
+    else:
+        return str(ovh_exception)
+
+
+def update_reverse(check_mode, client, ip, original_reverse, reverse, results, verify=False):
+    """Update a reverse. The new reverse is taken from the answer of the
+    API, unless 'verify' asks to read it again"""
+    if original_reverse is None or original_reverse['reverse'] != reverse:
+        if original_reverse:
+            results['diff']['before'] = original_reverse['reverse'] + "\n"
+        updated_reverse = None
+        results['diff']['before'] = original_reverse['reverse'] + "\n" if original_reverse else "\n"
+        if not check_mode:
+            updated_reverse = client.post('/ip/{}/reverse'.format(ip_path(ip)), ipReverse=ip.compressed, reverse=reverse)
+            if verify or not isinstance(updated_reverse, dict) or 'reverse' not in updated_reverse:
+                updated_reverse = get_reverse(client, ip)
+            results['reverse'] = updated_reverse
+            results['msg'] = 'IP reverse for {} updated from {} to {}'.format(ip, original_reverse['reverse'] if original_reverse else '<none>', updated_reverse['reverse'])
+            results['diff']['after'] = updated_reverse['reverse'] + "\n"
+        else:
+            results['reverse'] = None
+            results['msg'] = 'IP reverse for {} needs to be updated from {} to {}'.format(ip, original_reverse['reverse'] if original_reverse else '<none>', reverse)
+            results['diff']['after'] = reverse + "\n"
+        results['changed'] = True
+    else:
+        results['msg'] = 'IP reverse for {} already set to {}'.format(ip, reverse)
+
+
+def delete_reverse(check_mode, client, ip, original_reverse, results):
+    """Delete a reverse"""
+    if original_reverse is None:
+        results['msg'] = 'IP reverse record for {} is absent.'.format(ip)
+        return
+    if not check_mode:
+        client.delete('/ip/{}/reverse/{}'.format(ip_path(ip), original_reverse['ipReverse']))
+        results['msg'] = 'IP reverse record for {} deleted.'.format(ip)
+    else:
+        results['msg'] = 'IP reverse record for {} needs to be deleted.'.format(ip)
+    results['diff']['before'] = original_reverse['reverse'] + "\n"
+    results['diff']['after'] = "\n"
+    results['changed'] = True
+    results['reverse'] = None
+
+
+def batch_entries(ips, reverse, state):
+    """Turn the ips parameter, a mapping of IP to reverse or a list of IPs
+    or of dicts with ip, reverse and state, into (address, reverse, state)
+    entries; missing values default to the module ones"""
+    if isinstance(ips, dict):
+        return [(parse_ip(ip), ips[ip], state) for ip in ips]
+    if not isinstance(ips, list):
+        raise ValueError('ips must be a list or a mapping of IP to reverse')
+    entries = []
+    for item in ips:
+        if isinstance(item, dict):
+            if not item.get('ip'):
+                raise ValueError('ips item {} has no ip'.format(item))
+            entries.append((parse_ip(item['ip']), item.get('reverse', reverse), item.get('state') or state))
+        else:
+            entries.append((parse_ip(item), reverse, state))
+    for ip, entry_reverse, entry_state in entries:
+        if entry_state not in ('present', 'absent'):
+            raise ValueError('Invalid state {} for {}'.format(entry_state, ip))
+    return entries
+
+
+def run_batch(check_mode, client, entries, workers, profiler, known=None, verify=False):
+    """Reconcile many reverses: the current ones are all read first, unless
+    already 'known' from a block listing, then the changes are made,
+    'workers' IPs at a time. Return the results of each IP"""
+    def read(entry):
+        ip = entry[0]
+        results = dict(changed=False, msg='', original_reverse=None, reverse=None, diff={})
+        try:
+            if known is not None:
+                results['original_reverse'] = results['reverse'] = known[ip]
+            else:
+                results['original_reverse'] = results['reverse'] = get_reverse(client, ip)
+        except Exception as e:
+            results['failed'] = True
+            results['msg'] = 'IP reverse for {} does not seem to be manageable: {}.'.format(ip, exc_str(e))
+        return results
+
+    def reconcile(args):
+        (ip, reverse, state), results = args
+        if results.get('failed'):
+            return results
+        try:
+            if state == 'absent':
+                delete_reverse(check_mode, client, ip, results['original_reverse'], results)
+            elif reverse:
+                update_reverse(check_mode, client, ip, results['original_reverse'], reverse, results, verify)
+            elif results['original_reverse'] is None:
+                results['msg'] = 'No IP reverse for {} and not reverse provided. Failure.'.format(ip)
+                results['failed'] = True
+            else:
+                results['msg'] = 'IP reverse record for {} is set to {}.'.format(
+                    ip, results['original_reverse']['reverse'])
+        except Exception as e:
+            results['failed'] = True
+            results['msg'] = 'IP reverse for {} fails during update: {}.'.format(ip, exc_str(e))
+        return results
+
+    pool = ThreadPool(max(1, min(workers, len(entries))))
+    try:
+        profiler.start('fetch')
+        current = pool.map(read, entries)
+        profiler.stop('fetch')
+        profiler.start('update')
+        done = pool.map(reconcile, zip(entries, current))
+        profiler.stop('update')
+    finally:
+        pool.close()
+        pool.join()
+    return dict((entry[0].compressed, results) for entry, results in zip(entries, done))
+
+
+# Largest block whose reverses are generated from a template
+MAX_TEMPLATE_ADDRESSES = 65536
+
+ARGUMENT_SPEC = dict(
+    ip=dict(required=False),
+    ips=dict(required=False, type='raw'),
+    block=dict(required=False),
+    template=dict(required=False),
+    reverse=dict(required=False),
+    state=dict(default='present', choices=['present', 'absent']),
+    workers=dict(default=8, type='int'),
+    verify=dict(default=False, type='bool'),
+    api_retries=dict(default=5, type='int'),
+    profile=dict(default=False, type='bool'),
+)
+MUTUALLY_EXCLUSIVE = [['ip', 'ips'], ['ip', 'block']]
+REQUIRED_IF = [
+    ['state', 'present', ['ip', 'ips', 'block'], True],
+    ['state', 'absent', ['ip', 'ips'], True],
+]
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=ARGUMENT_SPEC,
+        required_if=REQUIRED_IF,
+        mutually_exclusive=MUTUALLY_EXCLUSIVE,
+        supports_check_mode=True
+    )
+    run_module(module, get_client(module))
+
+
+def run_module(module, client):
+    """Check or update the reverse as requested by the module parameters;
+    always ends with module.exit_json() or module.fail_json()"""
+    results = dict(
+        changed=False,
+        msg='',
+        original_reverse=None,
+        reverse=None,
+        diff={},
+        failed=False
+    )
+    response = []
+
+    # Get parameters
+    ip = module.params.get('ip')
+    reverse = module.params.get('reverse')
+    state = module.params.get('state')
+    profiler = Profiler()
+    client = profiler.wrap(client)
+    profiler.attach(module, module.params.get('profile'))
+
+    block = module.params.get('block')
+    known = None
+    if block is not None:
+        try:
+            network = ipaddress.ip_network(u'{}'.format(block), strict=False)
+        except ValueError as e:
+            module.fail_json(msg='Invalid block {}: {}'.format(block, e))
+
+    # Generate the reverse of every address of the block
+    ips = module.params.get('ips')
+    template = module.params.get('template')
+    entries = None
+    if template is not None:
+        if block is None or ips is not None:
+            module.fail_json(msg='template needs block, and cannot be used with ips')
+        if state != 'present':
+            module.fail_json(msg='template is only supported with state=present')
+        if network.num_addresses > MAX_TEMPLATE_ADDRESSES:
+            module.fail_json(msg='template is limited to blocks of {} addresses'.format(MAX_TEMPLATE_ADDRESSES))
+        try:
+            entries = [(address, template_reverse(template, address), state) for address in network]
+        except (KeyError, IndexError, ValueError) as e:
+            module.fail_json(msg='Invalid template {}: {}'.format(template, e))
+
+    # List the reverses of a block
+    if block is not None and ips is None and entries is None:
+        try:
+            profiler.start('fetch')
+            known = get_block_reverses(client, network, workers=module.params.get('workers'))
+            profiler.stop('fetch')
+        except Exception as e:
+            module.fail_json(msg='IP reverses of {} do not seem to be manageable: {}.'.format(block, exc_str(e)))
+        results.pop('original_reverse')
+        results.pop('failed')
+        results.pop('reverse')
+        results['reverses'] = dict((address.compressed, known[address]['reverse']) for address in known)
+        results['msg'] = '{} IP reverse(s) in {}'.format(len(known), block)
+        module.exit_json(**results)
+
+    # Reconcile many reverses at once
+    if ips is not None or entries is not None:
+        if entries is None:
+            try:
+                entries = batch_entries(ips, reverse, state)
+            except ValueError as e:
+                module.fail_json(msg=str(e))
+        if block is not None:
+            # Read every current reverse from a single listing of the block
+            outside = [entry[0].compressed for entry in entries if entry[0] not in network]
+            if outside:
+                module.fail_json(msg='IPs outside of {}: {}'.format(block, ', '.join(outside)))
+            try:
+                profiler.start('fetch')
+                known = get_block_reverses(client, network, [entry[0] for entry in entries],
+                                           module.params.get('workers'))
+                profiler.stop('fetch')
+            except Exception as e:
+                module.fail_json(msg='IP reverses of {} do not seem to be manageable: {}.'.format(block, exc_str(e)))
+        done = run_batch(module.check_mode, client, entries, module.params.get('workers'), profiler, known,
+                         module.params.get('verify'))
+
+        before = []
+        after = []
+        failed = []
+        for address, entry_reverse, entry_state in entries:
+            ip = address.compressed
+            ip_results = done[ip]
+            diff = ip_results.pop('diff')
+            if ip_results['changed']:
+                results['changed'] = True
+                before.append('{} {}'.format(ip, diff['before'].strip() or '<none>'))
+                after.append('{} {}'.format(ip, diff['after'].strip() or '<none>'))
+            if ip_results.get('failed'):
+                failed.append(ip)
+        results.pop('original_reverse')
+        results.pop('reverse')
+        results.pop('failed')
+        if template is not None:
+            # Only report the addresses which needed work
+            done = dict((ip, done[ip]) for ip in done
+                        if done[ip]['changed'] or done[ip].get('failed'))
+        results['reverses'] = done
+        if before:
+            results['diff'] = dict(before='\n'.join(before) + '\n', after='\n'.join(after) + '\n')
+        results['msg'] = '{} of {} IP reverse(s) changed'.format(
+            len(before), len(entries))
+        if failed:
+            results['msg'] += ', failed for {}'.format(', '.join(failed))
+            module.fail_json(**results)
+        module.exit_json(**results)
+
+    try:
+        ip = parse_ip(ip)
+    except ValueError as e:
+        module.fail_json(msg=str(e))
+
+    # Check that the domain exists
+    original_reverse = None
+    try:
+        profiler.start('fetch')
+        original_reverse = get_reverse(client, ip)
+        profiler.stop('fetch')
+        results['original_reverse'] = original_reverse
+        results['reverse'] = original_reverse
+    except Exception as e:
+        module.fail_json(msg='IP reverse for {} does not seem to be manageable: {}.'.format(ip, exc_str(e)))
+
+    try:
+        if state == 'present':
+            if reverse:
+                # we have a value to check and set
+                update_reverse(module.check_mode, client, ip, original_reverse, reverse, results,
+                               module.params.get('verify'))
+            else:
+                # we only check if reverse is set (whatever value it is)
+                if original_reverse is None:
+                    # no reverse to set and no reverse, failure
+                    results['msg'] = 'No IP reverse for {} and not reverse provided. Failure.'.format(ip)
+                    results['failed'] = True
+                else:
+                    results['msg'] = 'IP reverse record for {} is set to {}.'.format(ip, original_reverse['reverse'])
+        elif state == 'absent':
+            delete_reverse(module.check_mode, client, ip, original_reverse, results)
+
+        failed = results['failed']
+        results.pop('failed')
+        if failed:
+            module.fail_json(**results)
+        else:
+            module.exit_json(**results)
+    except Exception as e:
+        module.fail_json(msg='IP reverse for {} fails during update: {}.'.format(ip, exc_str(e)))
+
+
+
+# import module snippets
+from ansible.module_utils.basic import *
+
+if __name__ == '__main__':
+    main()
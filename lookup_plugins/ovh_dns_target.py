@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns_target, an Ansible lookup plugin finding OVH DNS records by target
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+name: ovh_dns_target
+author: Carlos Izquierdo
+short_description: Find the OVH DNS records pointing to an address or a host
+description:
+    - Return every A, AAAA and CNAME record, across the zones of the account,
+      whose target is one of the given IP addresses or host names.
+    - Answers come from the target index of the ovh_dns SQLite cache. Zones
+      not synced for 'max_age' seconds are first synced incrementally, like
+      ovh_dns does with cache=true; their ids are listed concurrently, and
+      only the details of new or expired records are fetched.
+    - Host names are absolute; relative CNAME targets are resolved against
+      their zone. Needs module_utils/ of this repository in the module_utils
+      path, and its ovh_dns action plugin.
+requirements: [ "ovh" ]
+options:
+    _terms:
+        description: IP addresses or host names
+        required: true
+    zones:
+        type: list
+        elements: str
+        description:
+            - Zones to search; all the zones of the account by default
+    max_age:
+        type: int
+        default: 3600
+        description:
+            - Age in seconds of the last sync of a zone after which it is
+              synced again before answering; 0 always syncs
+    cache_path:
+        default: ~/.ansible/tmp/ovh_dns_cache.sqlite
+        description:
+            - Location of the cache, shared with ovh_dns and ovh_dns_info
+    cache_max_age:
+        type: int
+        default: 86400
+        description:
+            - Age in seconds after which the details of a record are fetched
+              again when its zone is synced; 0 never expires records
+    workers:
+        type: int
+        default: 8
+        description:
+            - Number of concurrent requests used to list zones and fetch
+              record details
+    api_retries:
+        type: int
+        default: 5
+        description:
+            - Number of times a call throttled by the OVH API is retried
+'''
+
+EXAMPLES = '''
+# Every record pointing to a server being decommissioned
+- debug:
+    msg: "{{ item.name }}.{{ item.zone }} {{ item.type }} {{ item.value }}"
+  loop: "{{ lookup('ovh_dns_target', '10.10.10.10', 'db1.mydomain.com', wantlist=True) }}"
+
+# Only trust the index, without any API call
+- debug:
+    msg: "{{ lookup('ovh_dns_target', '10.10.10.10', max_age=86400000, wantlist=True) }}"
+'''
+
+import ipaddress
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from ansible.errors import AnsibleError
+from ansible.plugins.loader import action_loader, module_utils_loader
+from ansible.plugins.lookup import LookupBase
+
+# ovh library and module_utils of this repository, imported on first use
+_HELPERS = None
+
+
+def load_helpers():
+    """Import the ovh library, and the API client and record cache shared
+    with ovh_dns"""
+    global _HELPERS
+    if _HELPERS is None:
+        try:
+            import ovh
+        except ImportError:
+            raise AnsibleError('ovh required for the ovh_dns_target lookup')
+        # The ovh_dns action plugin knows how to import module_utils on the
+        # controller
+        action = action_loader.get('ovh_dns', class_only=True)
+        if action is None:
+            raise AnsibleError('ovh_dns_target needs the ovh_dns action plugin')
+        sys.modules[action.__module__].use_module_utils(module_utils_loader)
+        try:
+            from ansible.module_utils import ovh_api, ovh_dns_records
+        except ImportError as e:
+            raise AnsibleError('ovh_dns_target needs module_utils/ in the module_utils path: {}'.format(e))
+        _HELPERS = ovh, ovh_api, ovh_dns_records
+    return _HELPERS
+
+
+def normalize(term):
+    """Normalize an address or a host name like record_target() does"""
+    term = term.strip().lower()
+    try:
+        return ipaddress.ip_address(u'{}'.format(term)).compressed
+    except ValueError:
+        return term if term.endswith('.') else term + '.'
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        ovh, ovh_api, ovh_dns_records = load_helpers()
+
+        cache = ovh_dns_records.RecordCache(self.get_option('cache_path'), self.get_option('cache_max_age'))
+        try:
+            zones = set(self.sync(cache))
+            results = []
+            for term in terms:
+                for zone, record in cache.find(normalize(term)):
+                    # The cache may hold zones which are not searched
+                    if zone not in zones:
+                        continue
+                    results.append(dict(
+                        zone=zone,
+                        id=record['id'],
+                        name=record['subDomain'],
+                        type=record['fieldType'],
+                        value=record['target'],
+                        ttl=record['ttl'],
+                        ))
+            return results
+        except ovh.exceptions.APIError as e:
+            raise AnsibleError('OVH API call failed: {}'.format(e))
+        finally:
+            cache.close()
+
+    def sync(self, cache):
+        """Sync the zones whose snapshot is older than max_age; return the
+        zones searched"""
+        ovh, ovh_api, ovh_dns_records = load_helpers()
+        workers = self.get_option('workers')
+        client = ovh_api.RateLimitedClient(ovh.Client(), self.get_option('api_retries'), workers)
+
+        zones = self.get_option('zones') or ovh_dns_records.list_zones(client, cache)
+
+        max_age = self.get_option('max_age')
+        synced = cache.get_synced()
+        now = time.time()
+        stale = [zone for zone in zones
+                 if not max_age or now - synced.get(zone, 0) > max_age]
+        if not stale:
+            return zones
+
+        # List the ids of all stale zones at once, the SQLite cache is then
+        # only used from this thread
+        def list_ids(zone):
+            return zone, ovh_dns_records.list_record_ids(client, zone)
+
+        pool = ThreadPool(max(1, min(workers, len(stale))))
+        try:
+            listings = pool.map(list_ids, stale)
+        finally:
+            pool.close()
+            pool.join()
+
+        for zone, record_ids in listings:
+            records = cache.sync(zone, record_ids)
+            missing = [record_id for record_id in record_ids if record_id not in records]
+            cache.put(zone, ovh_dns_records.get_record_details(client, zone, missing, workers))
+            cache.mark_synced(zone)
+        return zones
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+# ovh_api, the OVH API client layer shared by the ovh_* modules
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Client side of the OVH API calls made by the modules of this repository:
+the ovh_api persistent connection, throttling and retries, the API stats
+and timings reported by every module, and the stand-in for AnsibleModule
+used to run a module in-process.
+
+Ansible bundles this file with the modules which import it; it needs to be
+in the module_utils path (see the README).
+"""
+
+import re
+import math
+import time
+import random
+import threading
+
+import ovh
+from ansible.module_utils.connection import Connection
+
+
+class PersistentClient(object):
+    """Stand-in for ovh.Client sending the API calls through the ovh_api
+    persistent connection, which keeps one authenticated session per play"""
+
+    def __init__(self, socket_path):
+        self.connection = Connection(socket_path)
+
+    def call(self, method, path, **params):
+        response = self.connection.api_call(method, path, params)
+        if 'error' in response:
+            error = getattr(ovh.exceptions, response['error'], ovh.exceptions.APIError)
+            e = error(response['message'])
+            e.status = response.get('status')
+            e.retry_after = response.get('retry_after')
+            raise e
+        return response['result']
+
+    def get(self, path, **params):
+        return self.call('GET', path, **params)
+
+    def post(self, path, **params):
+        return self.call('POST', path, **params)
+
+    def put(self, path, **params):
+        return self.call('PUT', path, **params)
+
+    def delete(self, path, **params):
+        return self.call('DELETE', path, **params)
+
+
+def api_status(e):
+    """Return the HTTP status of an ovh exception, if known"""
+    status = getattr(e, 'status', None)
+    if status is None and getattr(e, 'response', None) is not None:
+        status = e.response.status_code
+    return status
+
+
+def api_retry_after(e):
+    """Return the delay requested by the API through Retry-After, if any"""
+    value = getattr(e, 'retry_after', None)
+    if value is None and getattr(e, 'response', None) is not None:
+        value = e.response.headers.get('Retry-After')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedClient(object):
+    """Wrap an ovh client to honour API throttling: throttled calls are
+    retried with a jittered exponential backoff, and the number of requests
+    in flight adapts to it, growing by one after a run of successes and
+    halved on each throttled call (AIMD)"""
+
+    BACKOFF = 0.5
+    MAX_BACKOFF = 30
+
+    def __init__(self, client, retries=5, concurrency=1):
+        self.client = client
+        self.retries = retries
+        self.limit = self.max_limit = max(1, concurrency)
+        self.inflight = 0
+        self.successes = 0
+        self.retried = 0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def _acquire(self):
+        with self.condition:
+            while self.inflight >= self.limit:
+                self.condition.wait()
+            self.inflight += 1
+
+    def _release(self, throttled):
+        with self.condition:
+            self.inflight -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.limit < self.max_limit and self.successes >= self.limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+    def call(self, method, path, **params):
+        attempt = 0
+        while True:
+            self._acquire()
+            throttled = False
+            try:
+                return getattr(self.client, method)(path, **params)
+            except ovh.exceptions.APIError as e:
+                status = api_status(e)
+                # A POST answered with 503 may have been processed
+                throttled = status == 429 or (status == 503 and method != 'post')
+                if not throttled or attempt >= self.retries:
+                    raise
+                delay = api_retry_after(e)
+                if delay is None:
+                    delay = min(self.MAX_BACKOFF, self.BACKOFF * 2 ** attempt)
+                    delay = delay / 2 + random.uniform(0, delay / 2)
+            finally:
+                self._release(throttled)
+            attempt += 1
+            self.retried += 1
+            time.sleep(delay)
+
+    def get(self, path, **params):
+        return self.call('get', path, **params)
+
+    def post(self, path, **params):
+        return self.call('post', path, **params)
+
+    def put(self, path, **params):
+        return self.call('put', path, **params)
+
+    def delete(self, path, **params):
+        return self.call('delete', path, **params)
+
+
+def get_client(module):
+    """Connect to OVH API, through the ovh_api connection when the task uses it"""
+    if module._socket_path:
+        client = PersistentClient(module._socket_path)
+    else:
+        client = ovh.Client()
+    return RateLimitedClient(client, module.params.get('api_retries', 5),
+                             module.params.get('workers', 1))
+
+
+def endpoint_template(path):
+    """Turn an API path into the endpoint it belongs to, such as
+    /domain/zone/{zone}/record/{id}"""
+    path = re.sub(r'^/domain/zone/[^/]+', '/domain/zone/{zone}', path)
+    path = re.sub(r'/record/\d+$', '/record/{id}', path)
+    path = re.sub(r'^/ip/[^/]+/reverse', '/ip/{ip}/reverse', path)
+    return re.sub(r'/reverse/[^/]+$', '/reverse/{ipReverse}', path)
+
+
+def percentile(values, rank):
+    """Nearest-rank percentile of a sorted list"""
+    return values[max(0, int(math.ceil(rank / 100.0 * len(values))) - 1)]
+
+
+class Profiler(object):
+    """Time the API calls made through a wrapped client, by method and
+    endpoint, count them by zone, and time named phases of the module.
+    Phases still running when the timings are reported are counted up to
+    that point"""
+
+    def __init__(self):
+        self.created = time.time()
+        self.client = None
+        self.calls = {}
+        self.zones = {}
+        self.phases = {}
+        self.running = {}
+        self.extra = {}
+        self.lock = threading.Lock()
+
+    def wrap(self, client):
+        self.client = client
+        return ProfiledClient(client, self)
+
+    def add_call(self, method, path, elapsed):
+        with self.lock:
+            key = '{} {}'.format(method.upper(), endpoint_template(path))
+            self.calls.setdefault(key, []).append(elapsed)
+            zone = re.match(r'^/domain/zone/([^/]+)', path)
+            if zone:
+                self.zones[zone.group(1)] = self.zones.get(zone.group(1), 0) + 1
+
+    def start(self, phase):
+        self.running[phase] = time.time()
+
+    def stop(self, phase):
+        if phase in self.running:
+            elapsed = time.time() - self.running.pop(phase)
+            self.phases[phase] = self.phases.get(phase, 0) + elapsed
+
+    def timings(self):
+        now = time.time()
+        phases = dict(self.phases)
+        for phase in self.running:
+            phases[phase] = phases.get(phase, 0) + now - self.running[phase]
+        api = {}
+        with self.lock:
+            for key in self.calls:
+                values = sorted(self.calls[key])
+                api[key] = dict(count=len(values),
+                                total=round(sum(values), 4),
+                                p50=round(percentile(values, 50), 4),
+                                p95=round(percentile(values, 95), 4))
+        return dict(api=api,
+                    phases=dict((phase, round(phases[phase], 4)) for phase in phases),
+                    total=round(now - self.created, 4))
+
+    def stats(self):
+        """Summary of the API usage, cheap enough to report on every run"""
+        endpoints = {}
+        with self.lock:
+            for key in self.calls:
+                endpoints[key] = dict(count=len(self.calls[key]),
+                                      total=round(sum(self.calls[key]), 4),
+                                      max=round(max(self.calls[key]), 4))
+            zones = dict(self.zones)
+        return dict(calls=sum(endpoint['count'] for endpoint in endpoints.values()),
+                    retries=getattr(self.client, 'retried', 0),
+                    throttled=getattr(self.client, 'throttled', 0),
+                    refreshes=endpoints.get('POST /domain/zone/{zone}/refresh', {}).get('count', 0),
+                    zones=zones,
+                    endpoints=endpoints)
+
+    def attach(self, module, profile=False):
+        """Add the API stats, the timings when profiling, and the entries of
+        'extra' to the results of every exit of the module"""
+        exit_json, fail_json = module.exit_json, module.fail_json
+
+        def report(kwargs):
+            kwargs.update(self.extra)
+            kwargs['api_stats'] = self.stats()
+            if profile:
+                kwargs['timings'] = self.timings()
+            return kwargs
+
+        def exit_with_stats(**kwargs):
+            exit_json(**report(kwargs))
+
+        def fail_with_stats(**kwargs):
+            fail_json(**report(kwargs))
+
+        module.exit_json = exit_with_stats
+        module.fail_json = fail_with_stats
+
+
+class ProfiledClient(object):
+    """Wrap an ovh client, timing each call (retries included)"""
+
+    def __init__(self, client, profiler):
+        self.client = client
+        self.profiler = profiler
+
+    def call(self, method, path, **params):
+        start = time.time()
+        try:
+            return getattr(self.client, method)(path, **params)
+        finally:
+            self.profiler.add_call(method, path, time.time() - start)
+
+    def get(self, path, **params):
+        return self.call('get', path, **params)
+
+    def post(self, path, **params):
+        return self.call('post', path, **params)
+
+    def put(self, path, **params):
+        return self.call('put', path, **params)
+
+    def delete(self, path, **params):
+        return self.call('delete', path, **params)
+
+
+class ModuleExit(SystemExit):
+    """Raised by InProcessModule with the results of the module. Like the
+    exit of AnsibleModule, it is not caught by 'except Exception'"""
+
+    def __init__(self, results):
+        super(ModuleExit, self).__init__(results.get('msg', ''))
+        self.results = results
+
+
+class InProcessModule(object):
+    """Minimal stand-in for AnsibleModule, used to run the module logic from
+    another Python process, such as the ovh_dns action plugin or the
+    benchmarks. Parameters must already be validated against the
+    ARGUMENT_SPEC of the module"""
+
+    def __init__(self, params, check_mode=False, socket_path=None):
+        self.params = params
+        self.check_mode = check_mode
+        self._socket_path = socket_path
+
+    def exit_json(self, **kwargs):
+        kwargs.setdefault('changed', False)
+        raise ModuleExit(kwargs)
+
+    def fail_json(self, **kwargs):
+        kwargs['failed'] = True
+        raise ModuleExit(kwargs)
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+# ovh_dns_records, reading OVH DNS records, shared by the ovh_dns* plugins
+# Copyright (C) 2014, Carlos Izquierdo <gheesh@gheesh.org>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+
+"""Reading the records of OVH DNS zones: through the id listing and the
+details of each record, or through a zone export, along with the SQLite
+cache of record details. Used by the ovh_dns and ovh_dns_info modules and by
+the ovh_dns_target lookup.
+"""
+
+import os
+import re
+import json
+import time
+import ipaddress
+import sqlite3
+from multiprocessing.pool import ThreadPool
+
+
+# Types the zone export holds as TXT records
+EXPORTED_AS_TXT = ('SPF', 'DKIM')
+
+RECORD_TYPES = ['A', 'AAAA', 'CNAME', 'CAA', 'DKIM', 'LOC', 'MX', 'NAPTR', 'NS', 'PTR', 'SPF', 'SRV', 'SSHFP', 'TXT', 'TLSA']
+
+
+def record_target(zone, record):
+    """Normalized address or host name an A, AAAA or CNAME record points
+    to, as kept in the target index of the cache; None for other types"""
+    target = record['target'].strip().lower()
+    if record['fieldType'] in ('A', 'AAAA'):
+        try:
+            return ipaddress.ip_address(u'{}'.format(target)).compressed
+        except ValueError:
+            return target
+    if record['fieldType'] == 'CNAME':
+        if not target.endswith('.'):
+            target = '{}.{}.'.format(target, zone.rstrip('.'))
+        return target
+    return None
+
+
+class RecordCache(object):
+    """Record details stored in a SQLite file, keyed by zone and record id.
+    The ids of a zone are a snapshot of its last listing, which the next
+    listing is diffed against. Records are also indexed by target"""
+
+    def __init__(self, path, max_age=0):
+        path = os.path.expanduser(path)
+        if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.max_age = max_age
+        self.sync_stats = dict(listed=0, added=0, removed=0, expired=0, fetched=0)
+        self.db = sqlite3.connect(path, timeout=60)
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS records ('
+                            'zone TEXT NOT NULL, id INTEGER NOT NULL, '
+                            'info TEXT NOT NULL, fetched_at REAL NOT NULL, '
+                            'target TEXT, PRIMARY KEY (zone, id))')
+            columns = [row[1] for row in self.db.execute('PRAGMA table_info(records)')]
+            if 'target' not in columns:
+                # Cache written before the target index
+                self.db.execute('ALTER TABLE records ADD COLUMN target TEXT')
+                self.db.executemany('UPDATE records SET target = ? WHERE zone = ? AND id = ?', [
+                    (record_target(zone, json.loads(info)), zone, id) for zone, id, info in
+                    self.db.execute('SELECT zone, id, info FROM records').fetchall()])
+            self.db.execute('CREATE INDEX IF NOT EXISTS records_target ON records (target)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS snapshots ('
+                            'zone TEXT PRIMARY KEY, synced_at REAL NOT NULL)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS zones ('
+                            'zone TEXT PRIMARY KEY, fetched_at REAL NOT NULL)')
+
+    def sync(self, zone, record_ids, subdomain=None, fieldtype=None):
+        """Diff the ids listed for a zone, or for a subdomain and/or type of
+        it, against the snapshot. Ids which are gone are dropped; return the
+        details of the known ids which have not expired"""
+        listed = set(record_ids)
+        oldest = time.time() - self.max_age if self.max_age else 0
+        records = {}
+        removed = []
+        known = 0
+        for record_id, info, fetched_at in self.db.execute(
+                'SELECT id, info, fetched_at FROM records WHERE zone = ?', (zone,)):
+            if record_id in listed:
+                known += 1
+                if fetched_at >= oldest:
+                    records[record_id] = json.loads(info)
+            elif not subdomain and fieldtype is None:
+                removed.append(record_id)
+            else:
+                # Only ids within the scope of the listing can be gone
+                info = json.loads(info)
+                if (not subdomain or info['subDomain'] == subdomain) and \
+                        (fieldtype is None or info['fieldType'] == fieldtype):
+                    removed.append(record_id)
+        self.remove(zone, removed)
+
+        self.sync_stats['listed'] += len(listed)
+        self.sync_stats['added'] += len(listed) - known
+        self.sync_stats['removed'] += len(removed)
+        self.sync_stats['expired'] += known - len(records)
+        return records
+
+    def put(self, zone, records):
+        now = time.time()
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)',
+                                [(zone, id, json.dumps(records[id]), now, record_target(zone, records[id]))
+                                 for id in records])
+
+    def remove(self, zone, record_ids):
+        with self.db:
+            self.db.executemany('DELETE FROM records WHERE zone = ? AND id = ?',
+                                [(zone, id) for id in record_ids])
+
+    def mark_synced(self, zone):
+        """Note that the whole zone was just listed and its details fetched"""
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?)', (zone, time.time()))
+
+    def get_zones(self):
+        """Return the cached list of zones, or None if unknown or expired"""
+        oldest = time.time() - self.max_age if self.max_age else 0
+        rows = self.db.execute('SELECT zone, fetched_at FROM zones').fetchall()
+        if not rows or min(fetched_at for zone, fetched_at in rows) < oldest:
+            return None
+        return [zone for zone, fetched_at in rows]
+
+    def put_zones(self, zones):
+        now = time.time()
+        with self.db:
+            self.db.execute('DELETE FROM zones')
+            self.db.executemany('INSERT INTO zones VALUES (?, ?)',
+                                [(zone, now) for zone in zones])
+
+    def get_synced(self):
+        """Return when each zone was last synced as a whole"""
+        return dict(self.db.execute('SELECT zone, synced_at FROM snapshots'))
+
+    def find(self, target):
+        """Return the zone and details of the records pointing to a target,
+        normalized like record_target() does"""
+        return [(zone, json.loads(info)) for zone, info in self.db.execute(
+            'SELECT zone, info FROM records WHERE target = ? ORDER BY zone, id', (target,))]
+
+    def close(self):
+        self.db.close()
+
+
+def list_zones(client, cache=None):
+    """List the zones of the account, from the cache when it has them"""
+    zones = cache.get_zones() if cache is not None else None
+    if zones is None:
+        zones = client.get('/domain/zone')
+        if cache is not None:
+            cache.put_zones(zones)
+    return zones
+
+
+def get_record_details(client, domain, record_ids, workers=1):
+    """Obtain the details of the given record ids, using up to 'workers'
+    concurrent requests"""
+    def fetch(record_id):
+        return record_id, client.get('/domain/zone/{}/record/{}'.format(domain, record_id))
+
+    if workers <= 1 or len(record_ids) <= 1:
+        return dict(fetch(record_id) for record_id in record_ids)
+
+    pool = ThreadPool(min(workers, len(record_ids)))
+    try:
+        # map() keeps the order of record_ids, as the sequential path does
+        return dict(pool.map(fetch, record_ids))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def list_record_ids(client, domain, fieldtype=None, subDomain=None):
+    """List the record ids of a zone, optionally of a subdomain and/or type"""
+    params = {}
+    if subDomain is not None:
+        params['subDomain'] = subDomain
+    if fieldtype is not None:
+        params['fieldType'] = fieldtype
+    return client.get('/domain/zone/{}/record'.format(domain), **params)
+
+
+def get_domain_records(client, domain, fieldtype=None, subDomain=None, workers=1, cache=None):
+    """Obtain all records for a specific domain. With a cache, the listed
+    ids are diffed against the previous listing, and only the details of
+    new (or expired) ids are fetched"""
+    # List all ids and then get info for each one
+    record_ids = list_record_ids(client, domain, fieldtype, subDomain)
+    if cache is None:
+        return get_record_details(client, domain, record_ids, workers)
+
+    records = cache.sync(domain, record_ids, subDomain, fieldtype)
+    missing = [record_id for record_id in record_ids if record_id not in records]
+    fetched = get_record_details(client, domain, missing, workers)
+    cache.put(domain, fetched)
+    cache.sync_stats['fetched'] += len(fetched)
+    if not subDomain and fieldtype is None:
+        cache.mark_synced(domain)
+    records.update(fetched)
+    return dict((record_id, records[record_id]) for record_id in record_ids)
+
+
+def split_zone_line(line):
+    """Remove the comment of a zone file line and return it along with the
+    parenthesis depth change, ignoring quoted text"""
+    quoted = False
+    depth = 0
+    for i, c in enumerate(line):
+        if c == '"' and (i == 0 or line[i - 1] != '\\'):
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == ';':
+            return line[:i], depth
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+    return line, depth
+
+
+def parse_zone_export(zone, domain):
+    """Parse a BIND zone file, as returned by /domain/zone/{zone}/export,
+    into a list of records shaped like the ones of the API (without id).
+    Return them along with the lines that could not be parsed"""
+    records = []
+    unparsed = []
+    owner = ''
+    origin = domain.rstrip('.') + '.'
+    pending = ''
+    depth = 0
+
+    for line in zone.splitlines():
+        line, change = split_zone_line(line)
+        # Join multi-line entries, such as the SOA record
+        pending += line if not pending else ' ' + line.strip()
+        depth += change
+        if depth > 0:
+            continue
+        line, pending, depth = pending, '', 0
+
+        if not line.strip() or line.startswith('$'):
+            continue
+        entry = line.strip()
+
+        # A blank owner means the same owner as the previous line
+        if not line[0].isspace():
+            if len(line.split(None, 1)) < 2:
+                unparsed.append(entry)
+                continue
+            owner, line = line.split(None, 1)
+            if owner == '@' or owner == origin:
+                owner = ''
+            elif owner.endswith('.' + origin):
+                owner = owner[:-len(origin) - 1]
+
+        ttl = 0
+        tokens = line.split(None, 1)
+        while tokens and (tokens[0].isdigit() or tokens[0].upper() == 'IN'):
+            if tokens[0].isdigit():
+                ttl = int(tokens[0])
+            tokens = tokens[1].split(None, 1) if len(tokens) > 1 else []
+        if len(tokens) < 2:
+            unparsed.append(entry)
+            continue
+        fieldtype, target = tokens[0].upper(), tokens[1].strip()
+        if fieldtype == 'SOA':
+            continue
+        if target.startswith('(') and target.endswith(')'):
+            target = target[1:-1].strip()
+
+        records.append(dict(
+            id=None,
+            zone=domain,
+            subDomain=owner,
+            fieldType=fieldtype,
+            target=target,
+            ttl=ttl,
+            ))
+
+    return records, unparsed
+
+
+def txt_value(target):
+    """Text of a TXT-like target, its quoted strings joined"""
+    strings = re.findall(r'"((?:[^"\\]|\\.)*)"', target)
+    return ''.join(strings) if strings else target.strip()
+
+
+def get_domain_records_export(client, domain, fieldtype=None, subDomain=None, workers=1):
+    """Obtain all records for a specific domain from a single zone export.
+    Records are keyed by placeholders until resolve_record_ids() is called.
+    The export holds SPF and DKIM records as TXT, and may hold lines the
+    parser does not know: those records are read by id instead"""
+    if fieldtype in EXPORTED_AS_TXT:
+        return get_domain_records(client, domain, fieldtype, subDomain, workers)
+
+    zone = client.get('/domain/zone/{}/export'.format(domain))
+    exported, unparsed = parse_zone_export(zone, domain)
+    if unparsed:
+        return get_domain_records(client, domain, fieldtype, subDomain, workers)
+
+    records = {}
+    for i, record in enumerate(exported):
+        # Same semantics as the subDomain/fieldType listing filters
+        if subDomain and record['subDomain'] != subDomain:
+            continue
+        if fieldtype is not None and record['fieldType'] != fieldtype:
+            continue
+        records['export-{}'.format(i)] = record
+
+    if fieldtype is None or fieldtype == 'TXT':
+        txt = [key for key in records if records[key]['fieldType'] == 'TXT']
+        if txt:
+            # Tell the SPF and DKIM records apart from the real TXT ones
+            for txt_type in EXPORTED_AS_TXT:
+                for id, record in get_domain_records(client, domain, txt_type, subDomain, workers).items():
+                    for key in txt:
+                        if records[key]['subDomain'] == record['subDomain'] and \
+                                txt_value(records[key]['target']) == txt_value(record['target']):
+                            txt.remove(key)
+                            del records[key]
+                            break
+                    if fieldtype is None:
+                        records[id] = record
+
+    return records
+
+
+def lookup_record_ids(client, domain, records, workers=1):
+    """Return the real id of records obtained from a zone export, keyed
+    like records. A record which is alone with its subdomain and type is
+    mapped from the id listing; the other ones are matched against their
+    details. The API ignores an empty subDomain filter, so apex records are
+    always matched against their details"""
+    ids = {}
+    groups = {}
+    for key in records:
+        if records[key]['id'] is None:
+            group = (records[key]['subDomain'], records[key]['fieldType'])
+            groups.setdefault(group, []).append(key)
+        else:
+            ids[key] = records[key]['id']
+
+    for (subdomain, fieldtype), keys in groups.items():
+        record_ids = client.get('/domain/zone/{}/record'.format(domain),
+                                subDomain=subdomain, fieldType=fieldtype)
+        if subdomain and len(keys) == 1 and len(record_ids) == 1:
+            ids[keys[0]] = record_ids[0]
+            continue
+
+        details = get_record_details(client, domain, record_ids, workers)
+        for key in keys:
+            for id in details:
+                if id not in ids.values() and details[id]['subDomain'] == subdomain and \
+                        details[id]['target'].lower() == records[key]['target'].lower():
+                    ids[key] = id
+                    break
+            else:
+                raise ValueError('Cannot find the id of {} record {} -> {}'.format(
+                    fieldtype, subdomain, records[key]['target']))
+
+    return ids
+
+
+def resolve_record_ids(client, domain, records, workers=1):
+    """Key records obtained from a zone export by their real ids"""
+    ids = lookup_record_ids(client, domain, records, workers)
+    return dict((ids[key], dict(records[key], id=ids[key])) for key in records)